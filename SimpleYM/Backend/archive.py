@@ -0,0 +1,304 @@
+"""
+Tiered storage for move and temperature check history.
+
+Records older than their collection's retention age (config.ARCHIVE_COLLECTIONS)
+are written to zstd-compressed Parquet files partitioned by month,
+
+    ARCHIVE_DIR/<collection>/year=YYYY/month=MM/part-<id>.parquet
+
+and then deleted from Firestore. Each row holds the document ID, the time
+field, a few filter columns and the full record as JSON. Queries prune
+partitions by month and push column filters down to Parquet, so the history
+endpoints can read both tiers without scanning everything.
+
+A trailer's latest completed move is never archived: occupancy, last known
+locations and trailer statistics keep working from Firestore alone.
+"""
+
+import base64
+import glob
+import itertools
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from firebase_service import db, is_tombstone, delete_documents, query_move_history
+from responses import dumps
+from config import ARCHIVE_DIR, ARCHIVE_PAGE_SIZE, ARCHIVE_COMPRESSION, ARCHIVE_COLLECTIONS
+
+
+def _pyarrow():
+    # pyarrow is only needed once something has been archived
+    import pyarrow
+    import pyarrow.parquet
+    return pyarrow, pyarrow.parquet
+
+
+def archive_columns(collection):
+    settings = ARCHIVE_COLLECTIONS[collection]
+    return ["id", settings["time_field"], *settings["columns"], "record"]
+
+
+def to_row(collection, doc_id, record):
+    settings = ARCHIVE_COLLECTIONS[collection]
+    row = {"id": doc_id, "record": dumps(record).decode()}
+    for column in [settings["time_field"], *settings["columns"]]:
+        value = record.get(column)
+        if value is not None and not isinstance(value, str):
+            # Timestamps and numbers are stored as their JSON form
+            value = json.loads(dumps(value))
+        row[column] = None if value is None else str(value)
+    return row
+
+
+def partition_of(value):
+    """(year, month) of an ISO timestamp string."""
+    return value[:4], value[5:7]
+
+
+def write_partition(collection, year, month, rows):
+    """Writes rows to a new part file. The file only appears once fully written."""
+    pa, pq = _pyarrow()
+    directory = os.path.join(ARCHIVE_DIR, collection, f"year={year}", f"month={month}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet")
+
+    schema = pa.schema([(column, pa.string()) for column in archive_columns(collection)])
+    table = pa.Table.from_pylist(rows, schema=schema)
+    pq.write_table(table, path + ".tmp", compression=ARCHIVE_COMPRESSION)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def latest_completed_moves():
+    """IDs of each trailer's most recent completed move."""
+    from firebase_admin import firestore
+
+    latest = {}
+    completed = db.collection("moves").where("status", "==", "completed") \
+        .order_by("completed_at", direction=firestore.Query.DESCENDING).select(["trailer_id"]).stream()
+    for doc in completed:
+        trailer_id = (doc.to_dict() or {}).get("trailer_id")
+        if trailer_id and trailer_id not in latest:
+            latest[trailer_id] = doc.id
+    return set(latest.values())
+
+
+def archive_collection(collection, after_days=None, progress=None):
+    """
+    Moves records older than after_days (default from config) into the archive,
+    one page at a time: the page is written to Parquet, then deleted from
+    Firestore. A page interrupted between the two is archived again on the next
+    run, and queries drop the duplicates. Tombstones are left for compaction.
+
+    progress(archived) is called after every page. Returns the number archived.
+    """
+    from firebase_admin import firestore
+
+    settings = ARCHIVE_COLLECTIONS[collection]
+    time_field = settings["time_field"]
+    days = settings["after_days"] if after_days is None else after_days
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    keep = latest_completed_moves() if collection == "moves" else set()
+
+    query = db.collection(collection)
+    if settings.get("status"):
+        query = query.where("status", "==", settings["status"])
+    query = query.where(time_field, "<", cutoff) \
+        .order_by(time_field, direction=firestore.Query.ASCENDING).limit(ARCHIVE_PAGE_SIZE)
+
+    archived = 0
+    last_doc = None
+    while True:
+        page = query.start_after(last_doc) if last_doc else query
+        docs = list(page.stream())
+        if not docs:
+            break
+        last_doc = docs[-1]
+
+        partitions = {}
+        refs = []
+        for doc in docs:
+            record = doc.to_dict()
+            timestamp = record.get(time_field)
+            if is_tombstone(record) or doc.id in keep or not isinstance(timestamp, str):
+                continue
+            partitions.setdefault(partition_of(timestamp), []).append(to_row(collection, doc.id, record))
+            refs.append(doc.reference)
+
+        for (year, month), rows in partitions.items():
+            write_partition(collection, year, month, rows)
+        archived += delete_documents(refs)
+        if progress:
+            progress(archived)
+
+    print(f"Archived {archived} {collection} records older than {cutoff}")
+    return archived
+
+
+def partition_files(collection, start=None, end=None):
+    """(month, path) of part files whose month can hold timestamps in [start, end), newest month first."""
+    pattern = os.path.join(ARCHIVE_DIR, collection, "year=*", "month=*", "part-*.parquet")
+    files = []
+    for path in glob.glob(pattern):
+        month_dir = os.path.dirname(path)
+        month = f"{os.path.basename(os.path.dirname(month_dir))[5:]}-{os.path.basename(month_dir)[6:]}"
+        if start and month < start[:7]:
+            continue
+        if end and month > end[:7]:
+            continue
+        files.append((month, path))
+    return sorted(files, reverse=True)
+
+
+def archive_conditions(collection, filters=None, start=None, end=None):
+    """Parquet filters for equality filters (column -> value) and a time range."""
+    settings = ARCHIVE_COLLECTIONS[collection]
+    for column in filters or {}:
+        if column not in settings["columns"]:
+            raise ValueError(f"{collection} archive can't be filtered by {column}")
+    conditions = [(column, "==", str(value)) for column, value in (filters or {}).items()]
+    if start:
+        conditions.append((settings["time_field"], ">=", start))
+    if end:
+        conditions.append((settings["time_field"], "<", end))
+    return conditions
+
+
+def query_archive(collection, filters=None, start=None, end=None, columns=None):
+    """
+    Archived rows matching the equality filters (column -> value) and a time
+    range (start inclusive, end exclusive), newest first. Rows hold the
+    requested columns plus id and the time field; include "record" to get the
+    full documents (see to_records).
+    """
+    time_field = ARCHIVE_COLLECTIONS[collection]["time_field"]
+    conditions = archive_conditions(collection, filters, start, end)
+    files = partition_files(collection, start, end)
+    if not files:
+        return []
+    _, pq = _pyarrow()
+    read_columns = list(dict.fromkeys(["id", time_field, *(columns or archive_columns(collection))]))
+
+    rows = {}
+    for _, path in files:
+        table = pq.read_table(path, columns=read_columns, filters=conditions or None)
+        for row in table.to_pylist():
+            rows[row["id"]] = row
+    return sorted(rows.values(), key=lambda row: (row[time_field] or "", row["id"]), reverse=True)
+
+
+def to_records(rows, with_id=True):
+    return [{"id": row["id"], **json.loads(row["record"])} if with_id else json.loads(row["record"]) for row in rows]
+
+
+def move_key(move):
+    return str(move.get("completed_at") or ""), move["id"]
+
+
+def query_archived_moves(filters, start=None, end=None, limit=50, after=None):
+    """
+    One page of archived completed moves, newest first, in the same shape as
+    firebase_service.query_move_history. after is the cursor from the previous
+    page. Months are read newest first from the cursor's month on, only the id
+    and completed_at columns, and reading stops once a month fills the page.
+    Full records are decoded for the page's rows only. Returns (moves, next_cursor).
+    """
+    before = None
+    if after:
+        completed_at, _, move_id = after.partition("|")
+        before = (completed_at, move_id)
+    upper = before[0] if before and (not end or before[0] < end) else end
+    conditions = archive_conditions("moves", filters, start, end)
+    if before:
+        conditions.append(("completed_at", "<=", before[0]))
+
+    files = partition_files("moves", start, upper)
+    if not files or limit < 1:
+        return [], None
+    _, pq = _pyarrow()
+
+    found = {}  # id -> (key, path)
+    for month, month_files in itertools.groupby(files, key=lambda file: file[0]):
+        # Everything in older months sorts after what has been found so far
+        if len(found) > limit:
+            break
+        for _, path in month_files:
+            table = pq.read_table(path, columns=["id", "completed_at"], filters=conditions or None)
+            for row in table.to_pylist():
+                key = move_key(row)
+                if before and key >= before:
+                    continue
+                found[row["id"]] = (key, path)
+
+    ordered = sorted(found.items(), key=lambda item: item[1][0], reverse=True)
+    page = ordered[:limit]
+
+    by_path = {}
+    for move_id, (_, path) in page:
+        by_path.setdefault(path, []).append(move_id)
+    records = {}
+    for path, ids in by_path.items():
+        table = pq.read_table(path, columns=["id", "record"], filters=[("id", "in", ids)])
+        records.update((row["id"], row) for row in table.to_pylist())
+
+    moves = to_records([records[move_id] for move_id, _ in page])
+    next_cursor = "|".join(page[-1][1][0]) if len(ordered) > limit else None
+    return moves, next_cursor
+
+
+def encode_history_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor):
+    """Raises ValueError for cursors that weren't returned by query_move_history_tiers."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(position, dict):
+            raise ValueError()
+        return position
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def query_move_history_tiers(filters, start=None, end=None, limit=50, cursor=None):
+    """
+    Completed moves from Firestore and the archive, merged newest first. The
+    tiers overlap in time (a trailer's latest move stays in Firestore past the
+    archive cutoff), so each page reads up to limit moves from both and keeps
+    the newest. The cursor holds the position in each tier. A move found in
+    both tiers (an archive run interrupted before its delete) is returned once.
+
+    Returns (moves, next_cursor); next_cursor is None on the last page.
+    """
+    position = decode_history_cursor(cursor) if cursor else {}
+    tiers = {}
+    if not position.get("hot_done"):
+        tiers["hot"] = query_move_history(filters, start=start, end=end, limit=limit, cursor=position.get("hot"))
+    if not position.get("archive_done"):
+        tiers["archive"] = query_archived_moves(filters, start=start, end=end, limit=limit,
+                                                after=position.get("archive"))
+
+    merged = sorted(((move, tier) for tier, (moves, _) in tiers.items() for move in moves),
+                    key=lambda item: move_key(item[0]), reverse=True)
+    page, seen = [], set()
+    taken = {tier: [] for tier in tiers}
+    for move, tier in merged:
+        if len(page) == limit and move["id"] not in seen:
+            break
+        taken[tier].append(move)
+        if move["id"] not in seen:
+            seen.add(move["id"])
+            page.append(move)
+
+    next_position = dict(position)
+    for tier, (moves, tier_next) in tiers.items():
+        if len(taken[tier]) == len(moves):
+            next_position[tier], next_position[f"{tier}_done"] = tier_next, tier_next is None
+        elif taken[tier]:
+            last = taken[tier][-1]
+            next_position[tier] = last["id"] if tier == "hot" else "|".join(move_key(last))
+
+    done = next_position.get("hot_done") and next_position.get("archive_done")
+    return page, None if done else encode_history_cursor(next_position)
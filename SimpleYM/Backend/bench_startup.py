@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the backend.
+
+Measures, in a fresh interpreter each run:
+- import: time to import main (no Firebase or pandas work should happen here)
+- startup: time for the lifespan handler to finish (the server accepts requests)
+- ready: time until the background cache warmup is done (/health ready=true)
+
+Usage: python bench_startup.py [runs]
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+MEASURE = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter() - t0
+
+async def run():
+    async with main.lifespan(main.app):
+        t_startup = time.perf_counter() - t0
+        while not main.startup_state["ready"] and not main.startup_state["warmup_error"]:
+            await asyncio.sleep(0.01)
+        return t_startup, time.perf_counter() - t0
+
+t_startup, t_ready = asyncio.run(run())
+print(json.dumps({
+    "import": t_import,
+    "startup": t_startup,
+    "ready": t_ready,
+    "pandas_loaded": "pandas" in __import__("sys").modules,
+    "warmup_error": main.startup_state["warmup_error"],
+}))
+"""
+
+
+def main(runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", MEASURE], capture_output=True, text=True, check=True)
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(f"Startup benchmark ({runs} runs)")
+    print("=" * 40)
+    for phase in ("import", "startup", "ready"):
+        times = [result[phase] for result in results]
+        print(f"{phase:>8}: median {statistics.median(times) * 1000:8.1f} ms   max {max(times) * 1000:8.1f} ms")
+
+    if any(result["pandas_loaded"] for result in results):
+        print("⚠️  pandas was imported during startup")
+    errors = {result["warmup_error"] for result in results if result["warmup_error"]}
+    for error in errors:
+        print(f"⚠️  Warmup error: {error}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
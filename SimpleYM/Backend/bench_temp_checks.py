@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for bulk temperature check ingestion (/add-temp-checks).
+
+Runs the endpoint's pipeline in process, parsing, validating, de-duplicating
+and writing in batches, for JSON and NDJSON payloads. Firestore is replaced
+by an in-memory client whose batch commit takes --commit-ms, so results show
+the backend's own cost plus the commit latency you choose. The target is
+5,000 readings per second.
+
+Usage: python bench_temp_checks.py [--readings N] [--runs N] [--commit-ms MS]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+import firebase_service
+import main
+
+TARGET_READINGS_PER_SECOND = 5000
+
+
+class FakeDocument:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+class FakeCollection:
+    def document(self, doc_id=None):
+        return FakeDocument(doc_id)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = 0
+
+    def set(self, ref, record):
+        self.writes += 1
+
+    def commit(self):
+        time.sleep(self.client.commit_seconds)
+        self.client.written += self.writes
+
+
+class FakeFirestore:
+    def __init__(self, commit_seconds):
+        self.commit_seconds = commit_seconds
+        self.written = 0
+
+    def collection(self, name):
+        return FakeCollection()
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def make_readings(count):
+    start = time.time() - 86400
+    return [{
+        "trailer_id": f"{random.randint(100000, 100500)}",
+        "clr_temp": round(random.uniform(30, 40), 1),
+        "fzr_temp": round(random.uniform(-10, 0), 1),
+        "timestamp": int(start + index),
+        "user_id": "bench",
+        "email": "bench@example.com",
+    } for index in range(count)]
+
+
+def run(body, content_type):
+    t0 = time.perf_counter()
+    readings = main.parse_temp_readings(body, content_type)
+    result = main.ingest_temp_readings(readings)
+    return time.perf_counter() - t0, result
+
+
+def main_benchmark(readings_count, runs, commit_ms):
+    firebase_service._client = FakeFirestore(commit_ms / 1000)
+    readings = make_readings(readings_count)
+    payloads = {
+        "json": (json.dumps(readings).encode(), "application/json"),
+        "ndjson": ("\n".join(json.dumps(reading) for reading in readings).encode(), "application/x-ndjson"),
+    }
+
+    print(f"Temperature check ingestion ({readings_count} readings, {runs} runs, {commit_ms} ms per commit)")
+    print("=" * 60)
+    for name, (body, content_type) in payloads.items():
+        times = []
+        for _ in range(runs):
+            elapsed, result = run(body, content_type)
+            times.append(elapsed)
+        rate = readings_count / statistics.median(times)
+        status = "ok" if rate >= TARGET_READINGS_PER_SECOND else "BELOW TARGET"
+        print(f"{name:>7}: median {statistics.median(times) * 1000:8.1f} ms   "
+              f"{rate:10.0f} readings/s   ({result['written']} written, {result['rejected']} rejected)  {status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readings", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--commit-ms", type=float, default=50)
+    args = parser.parse_args()
+    main_benchmark(args.readings, args.runs, args.commit_ms)
@@ -1,4 +1,4 @@
-import pytz
+from zoneinfo import ZoneInfo
 
 COMPANY_NAME = "SimpleYM"
 FIREBASE_CREDENTIALS = "service_account.json"
@@ -13,5 +13,188 @@ LOCATIONS = [
     "HRTHSDE",
 ]
 
+# Doors per location, used by the occupancy index to answer "free doors" queries,
+# e.g. {"FRZ": ["1", "2", "3"]}. Locations in the database can also list their
+# doors in a "doors" field. /free-doors answers 404 for locations with no doors
+# configured either way.
+LOCATION_DOORS = {}
+
+# Move statuses that still need a driver ("completed" moves are done)
+ACTIVE_MOVE_STATUSES = ["open", "picked up"]
+
+# Move queue: seconds a driver has to pick up a claimed move before it goes back
+# in the queue, and priority bonuses (in seconds of age) for urgent moves
+MOVE_LEASE_SECONDS = 120
+# Seconds a move released (skipped) by a driver is not offered to that driver again
+MOVE_SKIP_SECONDS = 10 * 60
+REEFER_PRIORITY_SECONDS = 15 * 60
+URGENT_PRIORITY_SECONDS = 60 * 60
+MOVE_LOCATION_PRIORITY = {
+    "FRZ": 10 * 60,
+    "CLR": 5 * 60,
+}
+
+# Seconds the locations list is served from memory before re-reading Firestore
+LOCATIONS_CACHE_SECONDS = 300
+
+# Response compression (see responses.py): bodies smaller than this are sent as is
+COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Delta sync (see sync.py): collections handheld clients sync, with the fields
+# whose values mark a change. The first field is the creation stamp. Both are
+# UTC ISO 8601 strings written by sync.change_stamps on every write path.
+SYNC_COLLECTIONS = {
+    "locations": ["created_at", "updated_at"],
+    "trailer_master": ["created_at", "updated_at"],
+    "moves": ["created_at", "updated_at"],
+}
+# Collections clients may write to while offline and replay through /sync
+SYNC_WRITABLE_COLLECTIONS = ["moves", "temperature_checks"]
+SYNC_CLOCK_SKEW_SECONDS = 5
+
+# Idempotency-Key store (see idempotency.py): how long responses are kept for
+# retries, and how many keys are kept at most
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_MAX_KEYS = 10000
+
+# Rate limits per user and route (see ratelimit.py): tokens per second and
+# burst size. Routes not listed use "default".
+RATE_LIMITS = {
+    "default": {"rate": 5, "burst": 20},
+    "/fetch-data": {"rate": 0.2, "burst": 5},
+    "/trailer-statistics": {"rate": 0.1, "burst": 2},
+    "/last-known-locations": {"rate": 0.2, "burst": 3},
+    "/upload-excel": {"rate": 0.05, "burst": 2},
+    "/add-temp-checks": {"rate": 20, "burst": 50},
+    "/sync": {"rate": 1, "burst": 10},
+}
+# How many requests may run each expensive endpoint at once
+CONCURRENCY_LIMITS = {
+    "fetch-data": 4,
+    "statistics": 2,
+    "last-known-locations": 4,
+    "dashboard-data": 8,
+    "upload-excel": 2,
+}
+CONCURRENCY_RETRY_AFTER_SECONDS = 2
+
+# Seconds a user_master profile is served from memory by /me and role checks
+PROFILE_CACHE_SECONDS = 300
+
+# Background jobs (see jobs.py): where job state and uploaded files are kept,
+# and how many jobs run at once
+JOBS_DIR = "data/jobs"
+JOB_WORKERS = 2
+
+# Soft delete: tombstones are purged by the compact_tombstones job once they
+# are older than the retention period (sync tokens older than this get a full
+# snapshot). Deleting a record also deletes the records that reference it.
+TOMBSTONE_RETENTION_DAYS = 30
+COMPACTION_INTERVAL_HOURS = 24
+CASCADE_DELETES = {
+    "trailer_master": [
+        ("moves", "trailer_id"),
+        ("temperature_checks", "trailer_id"),
+        ("inbound_pos", "trailer_id"),
+        ("load_submission", "trailer_id"),
+    ],
+}
+
+# History archival (see archive.py): records older than after_days move from
+# Firestore into monthly Parquet partitions under ARCHIVE_DIR. The listed
+# columns are stored next to the full record so archive queries can filter
+# on them without decoding every row.
+ARCHIVE_DIR = "data/archive"
+ARCHIVE_INTERVAL_HOURS = 24
+ARCHIVE_PAGE_SIZE = 500
+ARCHIVE_COMPRESSION = "zstd"
+ARCHIVE_COLLECTIONS = {
+    "moves": {
+        "time_field": "completed_at",
+        "status": "completed",
+        "after_days": 180,
+        "columns": ["trailer_id", "email", "user_id", "to_location", "to_door", "status"],
+    },
+    "temperature_checks": {
+        "time_field": "timestamp",
+        "after_days": 90,
+        "columns": ["trailer_id", "email", "user_id"],
+    },
+}
+
 TRAILER_ID_MIN_LENGTH = 6
-TIME_ZONE = pytz.timezone("America/New_York")  # Set to EST
+TIME_ZONE = ZoneInfo("America/New_York")  # Set to EST
+
+# Schema for all database collections (served by /collection-schema)
+COLLECTION_SCHEMA = {
+    "locations": {
+        "name": "String",
+        "doors": "Array"
+    },
+    "trailer_master": {
+        "id": "String",
+        "year": "Number",
+        "length": "Number",
+        "manufacturer": "String",
+        "roll_up_door": "Boolean",
+        "reefer": "Boolean",
+        "zones": "Number"
+    },
+    "user_master": {
+        "id": "String",
+        "name": "String",
+        "email": "String",
+        "role": "String",
+        "permissions": "Array"
+    },
+    "moves": {
+        "id": "String",
+        "trailer_id": "String",
+        "from_wh_yard": "String",
+        "from_door": "String",
+        "to_wh_yard": "String",
+        "to_door": "String",
+        "timestamp": "Timestamp",
+        "timestamp_EST": "Timestamp",
+        "created_at": "Timestamp",
+        "picked_up_at": "Timestamp",
+        "completed_at": "Timestamp",
+        "user_id": "String",
+        "email": "String",  # ADDED EMAIL FIELD
+        "status": "String"
+    },
+    "temperature_checks": {
+        "id": "String",
+        "trailer_id": "String",
+        "clr_temp": "Number",
+        "fzr_temp": "Number",
+        "timestamp": "Timestamp",
+        "user_id": "String",
+        "email": "String"  # ADDED EMAIL FIELD
+    },
+    "inbound_pos": {
+        "id": "String",
+        "po_numbers": "String",
+        "trailer_id": "String",
+        "status": "String",
+        "timestamp": "Timestamp"
+    },
+    "load_submission": {
+        "id": "String",
+        "user_id": "String",
+        "trailer_id": "String",
+        "from_wh": "String",
+        "from_door": "String"
+    }
+}
+
+# Fields that must be present and non-empty on every write (see validation.py)
+REQUIRED_FIELDS = {
+    "trailer_master": ["id"],
+    "moves": ["trailer_id"],
+    "temperature_checks": ["trailer_id"],
+    "inbound_pos": ["trailer_id"],
+    "load_submission": ["trailer_id"],
+}
@@ -1,21 +1,172 @@
+import threading
 import firebase_admin
 from firebase_admin import credentials, firestore
+from concurrent.futures import ThreadPoolExecutor
+from config import ACTIVE_MOVE_STATUSES, FIREBASE_CREDENTIALS
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("service_account.json")
-    firebase_admin.initialize_app(cred)
+_client = None
+_client_lock = threading.Lock()
 
-db = firestore.client()
 
-def upload_data(collection_name, data):
+def init_firebase():
+    """
+    Initializes the Firebase app (used by Auth) and the Firestore client. Called
+    from the app's lifespan handler; anything that touches db earlier
+    initializes on first use instead of at import.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not firebase_admin._apps:
+                cred = credentials.Certificate(FIREBASE_CREDENTIALS)
+                firebase_admin.initialize_app(cred)
+            _client = firestore.client()
+    return _client
+
+
+def get_db():
+    return _client or init_firebase()
+
+
+class LazyFirestore:
+    """Stands in for the Firestore client and forwards to it, creating it on first use."""
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+
+db = LazyFirestore()
+
+# Firestore rejects write batches with more than 500 operations
+BATCH_LIMIT = 500
+
+
+def upload_data(collection_name, data, batch_size=BATCH_LIMIT, max_workers=4):
+    """
+    Writes records in batched commits. Records with an "id" are written to that
+    document ID, the rest get an auto-generated ID. Independent batches are
+    committed in parallel, so large uploads are not bound by per-write latency.
+
+    Returns the number of records written.
+    """
     collection_ref = db.collection(collection_name)
-    for record in data:
-        doc_id = str(record.get("id", ""))
-        if doc_id:
-            collection_ref.document(doc_id).set(record)
-        else:
-            collection_ref.add(record)
+    chunks = [data[i:i + batch_size] for i in range(0, len(data), batch_size)]
+
+    def commit(chunk):
+        batch = db.batch()
+        for record in chunk:
+            doc_id = str(record.get("id", ""))
+            doc_ref = collection_ref.document(doc_id) if doc_id else collection_ref.document()
+            batch.set(doc_ref, record)
+        batch.commit()
+        return len(chunk)
+
+    if len(chunks) <= 1:
+        return sum(commit(chunk) for chunk in chunks)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        return sum(executor.map(commit, chunks))
+
+def query_move_history(filters, start=None, end=None, limit=50, cursor=None):
+    """
+    Returns one page of completed moves, newest first, matching the equality
+    filters (field -> value) and an optional completed_at range. Served by the
+    composite indexes in firestore.indexes.json, so only matching documents are
+    read.
+
+    Returns (moves, next_cursor); next_cursor is None on the last page.
+    """
+    moves_ref = db.collection("moves")
+    query = moves_ref.where("status", "==", "completed")
+
+    for field, value in filters.items():
+        query = query.where(field, "==", value)
+    if start:
+        query = query.where("completed_at", ">=", start)
+    if end:
+        query = query.where("completed_at", "<", end)
+
+    query = query.order_by("completed_at", direction=firestore.Query.DESCENDING)
+    last_doc = None
+    if cursor:
+        cursor_doc = moves_ref.document(cursor).get()
+        if cursor_doc.exists:
+            last_doc = cursor_doc
+
+    # Tombstones are skipped, so keep reading until the page is full. One extra
+    # document per read tells us whether there is more; the cursor is the last
+    # document read, which may be a tombstone.
+    moves = []
+    more = True
+    while more and len(moves) < limit:
+        wanted = limit - len(moves)
+        page = query.start_after(last_doc) if last_doc else query
+        docs = list(page.limit(wanted + 1).stream())
+        more = len(docs) > wanted
+        for doc in docs[:wanted]:
+            move = {"id": doc.id, **doc.to_dict()}
+            if not is_tombstone(move):
+                moves.append(move)
+            last_doc = doc
+
+    next_cursor = last_doc.id if more else None
+    return moves, next_cursor
+
 
 def fetch_data(collection_name):
     collection_ref = db.collection(collection_name)
-    return [doc.to_dict() for doc in collection_ref.stream()]
+    return [record for record in (doc.to_dict() for doc in collection_ref.stream()) if not is_tombstone(record)]
+
+
+def is_tombstone(record):
+    """Soft-deleted documents stay in place with deleted=True until compaction purges them."""
+    return bool(record) and record.get("deleted") is True
+
+
+def write_in_batches(refs, write):
+    """Applies write(batch, ref) to every document reference in batched commits. Returns the count."""
+    count = 0
+    for i in range(0, len(refs), BATCH_LIMIT):
+        batch = db.batch()
+        for ref in refs[i:i + BATCH_LIMIT]:
+            write(batch, ref)
+        batch.commit()
+        count += len(refs[i:i + BATCH_LIMIT])
+    return count
+
+
+def tombstone_documents(refs, fields):
+    return write_in_batches(refs, lambda batch, ref: batch.update(ref, fields))
+
+
+def delete_documents(refs):
+    return write_in_batches(refs, lambda batch, ref: batch.delete(ref))
+
+
+def watch_active_moves(listeners):
+    """
+    Attaches one Firestore listener to open and picked-up moves and passes every
+    change to each listener as a move dict. Moves leaving the query (completed,
+    cancelled or deleted, possibly straight from the clients) are re-read so
+    listeners see their new status; deleted moves arrive with status "deleted".
+
+    Returns the watch, call unsubscribe() on it to stop.
+    """
+    moves_ref = db.collection("moves")
+
+    def on_snapshot(snapshot, changes, read_time):
+        for change in changes:
+            if change.type.name == "REMOVED":
+                current = moves_ref.document(change.document.id).get()
+                move = {"id": current.id, **current.to_dict()} if current.exists \
+                    else {"id": change.document.id, "status": "deleted"}
+            else:
+                move = {"id": change.document.id, **change.document.to_dict()}
+
+            for listener in listeners:
+                try:
+                    listener(move)
+                except Exception as e:
+                    print(f"Error applying move {move['id']} to {listener}: {e}")
+
+    return moves_ref.where("status", "in", ACTIVE_MOVE_STATUSES).on_snapshot(on_snapshot)
@@ -0,0 +1,84 @@
+"""
+Idempotency-Key support for write endpoints.
+
+The first request with a given key runs normally and its response is kept in
+a bounded TTL store. Retries with the same key (same user, method and path)
+get the stored response back without running the endpoint again. A retry
+with a different body is rejected, and a retry that arrives while the first
+request is still running gets a 409 instead of running twice.
+"""
+
+import hashlib
+import threading
+from email.message import Message
+from cache import TTLCache
+from config import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_KEYS
+
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Responses that depend on timing rather than the request, so a retry should run again
+UNCACHED_STATUS_CODES = {401, 403, 408, 409, 429}
+
+NEW, REPLAY, IN_PROGRESS, MISMATCH = "new", "replay", "in_progress", "mismatch"
+
+
+def fingerprint(query_string, body, content_type=""):
+    """
+    Hash of a request's query string and body. Multipart bodies are hashed part
+    by part without the boundary, which clients pick anew on every send, so a
+    retried upload of the same fields and file matches.
+    """
+    if content_type.lower().startswith("multipart/"):
+        header = Message()
+        header["content-type"] = content_type
+        boundary = header.get_param("boundary")
+        if boundary:
+            body = b"\0".join(part.strip(b"\r\n") for part in body.split(b"--" + boundary.encode()))
+    return hashlib.sha256(query_string.encode() + b"\0" + body).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, maxsize=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL_SECONDS):
+        self._responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight = {}  # scope -> fingerprint
+        self._lock = threading.Lock()
+
+    def begin(self, scope, request_fingerprint):
+        """
+        Registers a request. Returns (state, cached) where state is NEW (run it and
+        call finish/abandon), REPLAY (cached holds the stored response), IN_PROGRESS
+        or MISMATCH (same key, different request).
+        """
+        with self._lock:
+            cached = self._responses.get(scope)
+            if cached:
+                if cached["fingerprint"] != request_fingerprint:
+                    return MISMATCH, None
+                return REPLAY, cached
+            if scope in self._in_flight:
+                if self._in_flight[scope] != request_fingerprint:
+                    return MISMATCH, None
+                return IN_PROGRESS, None
+            self._in_flight[scope] = request_fingerprint
+            return NEW, None
+
+    def finish(self, scope, request_fingerprint, status_code, headers, body):
+        with self._lock:
+            self._in_flight.pop(scope, None)
+            if status_code < 500 and status_code not in UNCACHED_STATUS_CODES:
+                self._responses.set(scope, {
+                    "fingerprint": request_fingerprint,
+                    "status_code": status_code,
+                    "headers": headers,
+                    "body": body,
+                })
+
+    def abandon(self, scope):
+        with self._lock:
+            self._in_flight.pop(scope, None)
+
+    def __len__(self):
+        return len(self._responses)
+
+
+idempotency_store = IdempotencyStore()
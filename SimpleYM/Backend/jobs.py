@@ -0,0 +1,255 @@
+"""
+In-process background jobs.
+
+Long-running work (imports, migrations, index rebuilds) runs on a bounded
+thread pool instead of inside a request. Job state is persisted in a local
+SQLite database, so a restart picks up jobs that were queued or running.
+Handlers are registered by type with @job_type and receive a JobContext for
+reporting progress, saving a checkpoint to resume from, and checking for
+cancellation. Handlers should be safe to re-run from their last checkpoint.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config import JOBS_DIR, JOB_WORKERS
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATUSES = {SUCCEEDED, FAILED, CANCELLED}
+
+# How often the scheduler checks a job type that is running or was just submitted
+SCHEDULE_POLL_SECONDS = 60
+
+JOB_TYPES = {}
+
+
+def job_type(name):
+    """Registers a job handler: handler(ctx, **params) -> JSON-serializable result."""
+    def decorator(func):
+        JOB_TYPES[name] = func
+        return func
+    return decorator
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobFailed(Exception):
+    """Raised by a handler to fail the job while keeping details (e.g. per-row errors) in its result."""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobContext:
+    def __init__(self, runner, job):
+        self.runner = runner
+        self.job_id = job["id"]
+        self.checkpoint = job["checkpoint"] or {}
+        self._last_saved = 0
+
+    def progress(self, done, total=None, message=None, checkpoint=None):
+        """Reports progress. Writes are throttled to one per second unless a checkpoint is given."""
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        now = time.monotonic()
+        if checkpoint is None and now - self._last_saved < 1:
+            return
+        self._last_saved = now
+        self.runner._update(self.job_id, progress={"done": done, "total": total, "message": message},
+                            checkpoint=self.checkpoint)
+
+    @property
+    def cancelled(self):
+        return self.job_id in self.runner._cancel_requested
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+
+class JobRunner:
+    def __init__(self, directory=JOBS_DIR, max_workers=JOB_WORKERS):
+        self.directory = directory
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._conn = None
+        self._executor = None
+        self._cancel_requested = set()
+        self._stopping = threading.Event()
+
+    # Persistence
+
+    def start(self):
+        """Opens the job database and resumes jobs left queued or running by the last process."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.directory, "jobs.db"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT,
+                    checkpoint TEXT,
+                    result TEXT,
+                    error TEXT,
+                    submitted_by TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at)")
+            self._conn.commit()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+
+        unfinished = self._query("SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING))
+        for job in unfinished:
+            print(f"Resuming {job['type']} job {job['id']}")
+            self._update(job["id"], status=QUEUED)
+            self._executor.submit(self._run, job["id"])
+
+    def schedule(self, type_name, interval_seconds, params=None):
+        """
+        Submits a job every interval_seconds, skipping a round if the previous one
+        hasn't finished. The next run is due interval_seconds after the last job of
+        the type finished, as recorded in the job database, so a process that
+        restarts more often than the interval still runs overdue jobs at start.
+        """
+        def loop():
+            while True:
+                pending = self._query("SELECT * FROM jobs WHERE type = ? AND status IN (?, ?)",
+                                      (type_name, QUEUED, RUNNING))
+                if pending:
+                    wait = min(interval_seconds, SCHEDULE_POLL_SECONDS)
+                else:
+                    wait = self._seconds_until_due(type_name, interval_seconds)
+                    if wait <= 0:
+                        self.submit(type_name, params, submitted_by="scheduler")
+                        wait = min(interval_seconds, SCHEDULE_POLL_SECONDS)
+                if self._stopping.wait(wait):
+                    return
+
+        threading.Thread(target=loop, name=f"schedule-{type_name}", daemon=True).start()
+
+    def _seconds_until_due(self, type_name, interval_seconds):
+        last = self._query(
+            f"SELECT * FROM jobs WHERE type = ? AND status IN ({', '.join('?' * len(FINISHED_STATUSES))}) "
+            "ORDER BY finished_at DESC LIMIT 1",
+            (type_name, *sorted(FINISHED_STATUSES)),
+        )
+        if not last or not last[0]["finished_at"]:
+            return 0
+        elapsed = (datetime.utcnow() - datetime.fromisoformat(last[0]["finished_at"])).total_seconds()
+        return interval_seconds - elapsed
+
+    def shutdown(self):
+        self._stopping.set()
+        # Running jobs stay "running" in the database and resume on next start
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._conn:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def _update(self, job_id, **fields):
+        for key in ("progress", "checkpoint", "result"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key], default=str)
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    @staticmethod
+    def _to_job(row):
+        job = dict(row)
+        for key in ("params", "progress", "checkpoint", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    # API
+
+    def submit(self, type_name, params=None, submitted_by=None):
+        if type_name not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {type_name}")
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, type, params, status, submitted_by, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, type_name, json.dumps(params or {}), QUEUED, submitted_by, datetime.utcnow().isoformat()),
+            )
+            self._conn.commit()
+        self._executor.submit(self._run, job_id)
+        print(f"Submitted {type_name} job {job_id}")
+        return self.get(job_id)
+
+    def get(self, job_id):
+        jobs = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list(self, status=None, limit=50):
+        if status:
+            return self._query("SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit))
+        return self._query("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+
+    def cancel(self, job_id):
+        """Cancels a queued job right away; a running job stops at its next cancellation check."""
+        job = self.get(job_id)
+        if not job or job["status"] in FINISHED_STATUSES:
+            return job
+        self._cancel_requested.add(job_id)
+        if job["status"] == QUEUED:
+            self._update(job_id, status=CANCELLED, finished_at=datetime.utcnow().isoformat())
+        return self.get(job_id)
+
+    # Execution
+
+    def _run(self, job_id):
+        try:
+            job = self.get(job_id)
+            if not job or job["status"] != QUEUED:
+                return
+            if job_id in self._cancel_requested:
+                self._update(job_id, status=CANCELLED, finished_at=datetime.utcnow().isoformat())
+                return
+            self._execute(job)
+        finally:
+            self._cancel_requested.discard(job_id)
+
+    def _execute(self, job):
+        job_id = job["id"]
+        self._update(job_id, status=RUNNING, started_at=datetime.utcnow().isoformat())
+        try:
+            result = JOB_TYPES[job["type"]](JobContext(self, job), **job["params"])
+            self._update(job_id, status=SUCCEEDED, result=result, finished_at=datetime.utcnow().isoformat())
+            print(f"{job['type']} job {job_id} succeeded")
+        except JobCancelled:
+            self._update(job_id, status=CANCELLED, finished_at=datetime.utcnow().isoformat())
+            print(f"{job['type']} job {job_id} cancelled")
+        except JobFailed as e:
+            self._update(job_id, status=FAILED, error=str(e), result=e.result,
+                         finished_at=datetime.utcnow().isoformat())
+            print(f"{job['type']} job {job_id} failed: {e}")
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=str(e), finished_at=datetime.utcnow().isoformat())
+            print(f"{job['type']} job {job_id} failed: {e}")
+
+
+job_runner = JobRunner()
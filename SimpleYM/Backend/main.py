@@ -1,24 +1,127 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
 from pydantic import BaseModel, EmailStr
-from typing import List, Dict
-import pandas as pd
-from firebase_service import upload_data, fetch_data, db
-from config import COMPANY_NAME, TIME_ZONE, LOCATIONS
-from firebase_admin import auth
+from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+import threading
+import time
+from firebase_service import upload_data, fetch_data, db, init_firebase, watch_active_moves
+from firebase_service import BATCH_LIMIT, is_tombstone, tombstone_documents, delete_documents
+from validation import ValidationError, validate_record, validate_records, validate_dataframe
+from occupancy import occupancy_index, move_destination
+from move_queue import move_queue
+from config import COMPANY_NAME, TIME_ZONE, LOCATIONS, COLLECTION_SCHEMA, LOCATIONS_CACHE_SECONDS
+from config import SYNC_COLLECTIONS, SYNC_WRITABLE_COLLECTIONS, JOBS_DIR
+from config import TOMBSTONE_RETENTION_DAYS, COMPACTION_INTERVAL_HOURS, CASCADE_DELETES
+from config import ARCHIVE_COLLECTIONS, ARCHIVE_INTERVAL_HOURS
+import sync
+import archive
+from cache import TTLCache
+from responses import json_response, shape_payload
+from ratelimit import rate_limiter, limit_concurrency
+from jobs import job_runner, job_type, JobFailed
+from roles import get_user_profile, get_role, require_role, require_write_access, set_role_claim, profile_cache
+from idempotency import idempotency_store, fingerprint, IDEMPOTENT_METHODS, NEW, REPLAY, IN_PROGRESS
+from firebase_admin import auth, firestore
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
-from firebase_admin import auth
-from firebase_admin.auth import EmailAlreadyExistsError
-import pytz
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime, timezone, timedelta
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from google.api_core.exceptions import AlreadyExists
+
+# Startup state, reported by /health
+startup_state = {"started_at": time.monotonic(), "ready": False, "ready_seconds": None, "warmup_error": None}
+active_moves_watch = None
+
+
+def warm_caches():
+    """
+    Loads reference caches and indexes after startup, off the request path.
+    Requests are served while this runs; /health reports when it finishes.
+    """
+    global active_moves_watch
+    try:
+        load_locations()
+        occupancy_index.load(db)
+        move_queue.load(db)
+        active_moves_watch = watch_active_moves([occupancy_index.apply_move, move_queue.apply_move])
+        startup_state["ready"] = True
+        startup_state["ready_seconds"] = round(time.monotonic() - startup_state["started_at"], 3)
+        print(f"Caches warmed in {startup_state['ready_seconds']}s")
+    except Exception as e:
+        startup_state["warmup_error"] = str(e)
+        print(f"Error warming caches: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Firestore and Auth are created here rather than at import, so importing
+    # main stays cheap and cold starts don't block on credentials
+    init_firebase()
+    job_runner.start()
+    job_runner.schedule("compact_tombstones", COMPACTION_INTERVAL_HOURS * 3600)
+    job_runner.schedule("archive_history", ARCHIVE_INTERVAL_HOURS * 3600)
+    threading.Thread(target=warm_caches, name="cache-warmup", daemon=True).start()
+    print("Backend server started successfully!")
+    yield
+    if active_moves_watch:
+        active_moves_watch.unsubscribe()
+    job_runner.shutdown()
+
 
 # Initialize the FastAPI app
 app = FastAPI(
     title="Yard Management Software",
     description="API backend for managing trailers, users, and yard operations.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+
+# Idempotency-Key handling for write endpoints. Registered before CORS so
+# replayed and rejected responses still get CORS headers.
+@app.middleware("http")
+async def idempotency_middleware(request: Request, call_next):
+    key = request.headers.get("Idempotency-Key")
+    if not key or request.method not in IDEMPOTENT_METHODS:
+        return await call_next(request)
+
+    # Keys are scoped per user, so the token is checked before anything is replayed
+    try:
+        decoded_token = validate_firebase_token(request, check_rate=False)
+    except HTTPException as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+
+    body = await request.body()
+    scope = (decoded_token.get("uid"), request.method, request.url.path, key)
+    request_fingerprint = fingerprint(request.url.query, body, request.headers.get("content-type", ""))
+
+    state, cached = idempotency_store.begin(scope, request_fingerprint)
+    if state == REPLAY:
+        print(f"Replaying response for Idempotency-Key {key} on {request.url.path}")
+        return Response(content=cached["body"], status_code=cached["status_code"],
+                        headers={**cached["headers"], "Idempotent-Replayed": "true"})
+    if state == IN_PROGRESS:
+        return JSONResponse(status_code=409, content={"detail": "A request with this Idempotency-Key is in progress."})
+    if state != NEW:
+        return JSONResponse(status_code=422, content={"detail": "Idempotency-Key was already used with a different request."})
+
+    try:
+        response = await call_next(request)
+        response_body = b"".join([chunk async for chunk in response.body_iterator])
+    except Exception:
+        idempotency_store.abandon(scope)
+        raise
+
+    headers = {name: value for name, value in response.headers.items() if name.lower() != "content-length"}
+    idempotency_store.finish(scope, request_fingerprint, response.status_code, headers, response_body)
+    return Response(content=response_body, status_code=response.status_code, headers=headers)
+
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -35,7 +138,14 @@ app.add_middleware(
 
 
 # Helper function to validate Firebase token
-def validate_firebase_token(request: Request):
+def validate_firebase_token(request: Request, check_rate: bool = True):
+    # Already verified earlier in this request (idempotency middleware)
+    decoded_token = getattr(request.state, "decoded_token", None)
+    if decoded_token:
+        if check_rate:
+            check_rate_limit(request, decoded_token)
+        return decoded_token
+
     auth_header = request.headers.get("Authorization")
     print("Authorization Header:", auth_header)
 
@@ -46,11 +156,34 @@ def validate_firebase_token(request: Request):
         token = auth_header.split("Bearer ")[1]
         decoded_token = auth.verify_id_token(token)
         print(f"Valid token for user: {decoded_token.get('email')}")
-        return decoded_token
+        request.state.decoded_token = decoded_token
     except Exception as e:
         print(f"Invalid token: {e}")
         raise HTTPException(status_code=401, detail="Invalid authentication token")
 
+    if check_rate:
+        check_rate_limit(request, decoded_token)
+    return decoded_token
+
+
+# Helper function to apply the per-user, per-route rate limit once per request
+def check_rate_limit(request: Request, decoded_token):
+    if getattr(request.state, "rate_checked", False):
+        return
+    request.state.rate_checked = True
+    route = request.scope.get("route")
+    rate_limiter.check(decoded_token.get("uid"), route.path if route else request.url.path)
+
+
+# Helper function to turn schema validation failures into a 422 response
+def validation_http_error(error: ValidationError):
+    print(f"Validation failed: {error}")
+    return HTTPException(status_code=422, detail={
+        "message": str(error),
+        "error_count": error.error_count,
+        "errors": error.errors,
+    })
+
 
 # Helper function to generate timestamps
 def get_current_timestamps():
@@ -76,6 +209,28 @@ class Record(BaseModel):
     data: List[Dict]
 
 
+class OfflineWrite(BaseModel):
+    idempotency_key: str
+    collection: str
+    data: Dict
+
+
+class SyncRequest(BaseModel):
+    token: Optional[str] = None
+    collections: Optional[List[str]] = None
+    writes: List[OfflineWrite] = []
+
+
+class JobRequest(BaseModel):
+    type: str
+    params: Dict = {}
+
+
+class CompleteMoveRequest(BaseModel):
+    to_location: str
+    to_door: str
+
+
 # Root endpoint
 @app.get("/")
 def root():
@@ -92,62 +247,18 @@ def get_schema():
     Returns:
     - JSON schema for each collection.
     """
+    return COLLECTION_SCHEMA
+
+
+# Health endpoint
+@app.get("/health")
+def health():
+    """Liveness plus readiness: ready turns true once the background cache warmup is done."""
     return {
-        "trailer_master": {
-            "id": "String",
-            "year": "Number",
-            "length": "Number",
-            "manufacturer": "String",
-            "roll_up_door": "Boolean",
-            "reefer": "Boolean",
-            "zones": "Number"
-        },
-        "user_master": {
-            "id": "String",
-            "name": "String",
-            "email": "String",
-            "role": "String",
-            "permissions": "Array"
-        },
-        "moves": {
-            "id": "String",
-            "trailer_id": "String",
-            "from_wh_yard": "String",
-            "from_door": "String",
-            "to_wh_yard": "String",
-            "to_door": "String",
-            "timestamp": "Timestamp",
-            "timestamp_EST": "Timestamp",
-            "created_at": "Timestamp",
-            "picked_up_at": "Timestamp",
-            "completed_at": "Timestamp",
-            "user_id": "String",
-            "email": "String",  # ADDED EMAIL FIELD
-            "status": "String"
-        },
-        "temperature_checks": {
-            "id": "String",
-            "trailer_id": "String",
-            "clr_temp": "Number",
-            "fzr_temp": "Number",
-            "timestamp": "Timestamp",
-            "user_id": "String",
-            "email": "String"  # ADDED EMAIL FIELD
-        },
-        "inbound_pos": {
-            "id": "String",
-            "po_numbers": "String",
-            "trailer_id": "String",
-            "status": "String",
-            "timestamp": "Timestamp"
-        },
-        "load_submission": {
-            "id": "String",
-            "user_id": "String",
-            "trailer_id": "String",
-            "from_wh": "String",
-            "from_door": "String"
-        }
+        "status": "ok",
+        "ready": startup_state["ready"],
+        "ready_seconds": startup_state["ready_seconds"],
+        "warmup_error": startup_state["warmup_error"],
     }
 
 
@@ -162,78 +273,197 @@ def get_current_time():
 
 
 # Locations endpoint
+locations_cache = TTLCache(maxsize=1, ttl=LOCATIONS_CACHE_SECONDS)
+
+
+def location_changed(location_id):
+    """Refreshes the cached location list and the location's doors in the occupancy index."""
+    locations_cache.clear()
+    doc = db.collection("locations").document(location_id).get()
+    record = doc.to_dict() if doc.exists else {}
+    if record.get("name"):
+        occupancy_index.set_doors(record["name"], [] if is_tombstone(record) else record.get("doors") or [])
+
+
+def load_locations():
+    """Reads location names from the database into the cache. Returns them sorted."""
+    locations_ref = db.collection("locations")
+    docs = locations_ref.stream()
+    records = [doc.to_dict() for doc in docs]
+    locations = sorted(record["name"] for record in records if record.get("name") and not is_tombstone(record))
+    print(f"Fetched {len(locations)} locations from database")
+    if locations:
+        locations_cache.set("locations", locations)
+    return locations
+
+
 @app.get("/locations")
 def get_locations(request: Request = None):
     """Fetch locations from database, fallback to config if empty"""
     try:
-        # Try to get locations from database first
-        locations_ref = db.collection("locations")
-        docs = locations_ref.stream()
-        locations = [doc.to_dict().get("name", "") for doc in docs if doc.to_dict().get("name")]
+        # Try to get locations from cache or database first
+        locations = locations_cache.get("locations") or load_locations()
 
         if locations:
-            print(f"Fetched {len(locations)} locations from database")
-            return {"locations": sorted(locations)}
+            return {"locations": locations}
         else:
             # Fallback to hardcoded locations if database is empty
-            from config import LOCATIONS
             print("Using fallback hardcoded locations")
             return {"locations": LOCATIONS}
 
     except Exception as e:
         print(f"Error fetching locations: {e}")
         # Fallback to hardcoded locations on error
-        from config import LOCATIONS
         return {"locations": LOCATIONS}
 
 
 # Fetch data endpoint
 @app.get("/fetch-data")
-def fetch_data_endpoint(collection: str, request: Request):
+@limit_concurrency("fetch-data")
+def fetch_data_endpoint(collection: str, request: Request, shape: str = "records", include_archived: bool = False):
+    """
+    Returns every record in a collection. shape=columnar returns
+    {"columns": [...], "rows": [[...]]} instead of a list of objects.
+    include_archived=true adds archived records for moves and temperature_checks.
+    """
     validate_firebase_token(request)
     try:
         print(f"Fetching data for collection: {collection}")
         data = fetch_data(collection)
+        if include_archived and collection in ARCHIVE_COLLECTIONS:
+            data += archive.to_records(archive.query_archive(collection), with_id=False)
         print(f"Fetched {len(data)} records from {collection}")
-        return {"data": data}
+        return json_response(request, shape_payload({"data": data}, shape, ["data"]))
     except Exception as e:
         print(f"Error fetching data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def release_reservations(move_ids):
+    for move_id in move_ids:
+        occupancy_index.release(move_id)
+
+
 # Add record endpoint
 @app.post("/add-record")
-async def add_record(record: Record, request: Request):
+def add_record(record: Record, request: Request):
     """
     Updated to handle optional IDs and auto-generate them when not provided.
     """
-    validate_firebase_token(request)
+    decoded_token = validate_firebase_token(request)
 
     try:
         if not record or not record.data or not record.collection:
             raise HTTPException(status_code=400, detail="Invalid data or collection name.")
+        require_write_access(decoded_token, record.collection)
 
         # Add timestamps and auto-generate IDs if not provided
         for item in record.data:
-            # Auto-generate ID if not provided
+            # Auto-generate ID if not provided. Firestore's random IDs, as IDs from the
+            # clock collided for records added in the same second and overwrote each other
             if not item.get("id"):
-                item["id"] = f"{record.collection}_{int(datetime.utcnow().timestamp())}"
+                item["id"] = f"{record.collection}_{db.collection(record.collection).document().id}"
 
             timestamps = get_current_timestamps()
             item.update(timestamps)
+            item.update(sync.change_stamps(created=True))
+            if record.collection == "moves":
+                # Moves without a status are missed by the active moves listener and sync
+                item["status"] = item.get("status") or "open"
+
+        # Validate and coerce against the collection schema
+        try:
+            record.data = validate_records(record.collection, record.data)
+        except ValidationError as e:
+            raise validation_http_error(e)
+
+        # Reserve each move's destination door, rejecting doors that are occupied or
+        # already claimed, including by earlier moves in this batch
+        reserved = []
+        if record.collection == "moves":
+            for item in record.data:
+                destination = move_destination(item)
+                conflict = destination and occupancy_index.try_reserve(
+                    item.get("id"), *destination, trailer_id=item.get("trailer_id")
+                )
+                if conflict:
+                    release_reservations(reserved)
+                    raise HTTPException(status_code=409, detail=conflict)
+                if destination:
+                    reserved.append(item.get("id"))
 
         # Log the data being uploaded
         print(f"Uploading to collection: {record.collection}")
         print(f"Data: {record.data}")
 
         # Upload the data to Firestore
-        upload_data(record.collection, record.data)
+        try:
+            upload_data(record.collection, record.data)
+        except Exception:
+            release_reservations(reserved)
+            raise
+
+        if record.collection == "moves":
+            for item in record.data:
+                occupancy_index.apply_move(item)
+                move_queue.apply_move(item)
+        elif record.collection == "locations":
+            for item in record.data:
+                location_changed(item["id"])
+
         return {"message": f"Record added successfully to {record.collection}."}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in /add-record endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Error adding record: {str(e)}")
 
+# Helper function to keep the role claim in step with user_master updates.
+# Callers must have passed require_write_access for user_master (admin only).
+def sync_user_role(uid, update_data):
+    profile_cache.pop(uid)
+    if "role" in update_data:
+        try:
+            set_role_claim(uid, update_data["role"])
+        except auth.UserNotFoundError:
+            print(f"User {uid} not found in Firebase Auth, role claim not updated")
+
+
+# Current user endpoint
+@app.get("/me")
+def get_me(request: Request):
+    """
+    Returns the current user's profile and role. The role comes from the token's
+    custom claims; the profile is a single cached document read. Users without
+    a role claim yet get it backfilled, and claims_updated tells the client to
+    refresh its ID token.
+    """
+    decoded_token = validate_firebase_token(request)
+    uid = decoded_token.get("uid")
+
+    try:
+        profile = get_user_profile(uid) or {}
+        role = get_role(decoded_token)
+
+        claims_updated = False
+        if role and not decoded_token.get("role"):
+            set_role_claim(uid, role)
+            claims_updated = True
+
+        return {
+            "uid": uid,
+            "email": decoded_token.get("email"),
+            "name": profile.get("name") or decoded_token.get("name"),
+            "role": role,
+            "claims_updated": claims_updated,
+        }
+
+    except Exception as e:
+        print(f"Error fetching current user: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch user profile: {str(e)}")
+
+
 # Create user endpoint
 @app.post("/create-auth-user")
 def create_auth_user(user: CreateUserRequest, request: Request):
@@ -249,7 +479,8 @@ def create_auth_user(user: CreateUserRequest, request: Request):
     - Success message or error.
     """
     # Validate the requesting user's Firebase token
-    validate_firebase_token(request)
+    decoded_token = validate_firebase_token(request)
+    require_role(decoded_token, "admin")
 
     try:
         print(f"Creating user: {user.email} with role: {user.role}")
@@ -275,6 +506,9 @@ def create_auth_user(user: CreateUserRequest, request: Request):
         db.collection("user_master").document(auth_user.uid).set(user_data)
         print(f"User data added to Firestore: {user_data}")
 
+        # Role also goes into the token, so role checks don't read user_master
+        set_role_claim(auth_user.uid, user.role)
+
         return {
             "message": f"User {user.email} created successfully with role {user.role}.",
             "uid": auth_user.uid,
@@ -297,10 +531,12 @@ def create_auth_user(user: CreateUserRequest, request: Request):
 
 
 @app.get("/last-known-locations")
-async def get_last_known_locations(request: Request):
+@limit_concurrency("last-known-locations")
+def get_last_known_locations(request: Request, shape: str = "records"):
     """
     Gets the last known location for each trailer based on completed moves.
     Returns trailer IDs in numerical order with their last location and timestamp.
+    shape=columnar returns the list as {"columns": [...], "rows": [[...]]}.
 
     Returns:
     - List of trailers with their last known locations sorted numerically
@@ -323,7 +559,7 @@ async def get_last_known_locations(request: Request):
             trailer_id = move_data.get("trailer_id")
 
             # Skip if no trailer_id or if we already have a more recent location for this trailer
-            if not trailer_id or trailer_id in trailer_locations:
+            if not trailer_id or trailer_id in trailer_locations or is_tombstone(move_data):
                 continue
 
             # Store the most recent location data for this trailer
@@ -353,20 +589,83 @@ async def get_last_known_locations(request: Request):
 
         print(f"Found last known locations for {len(result)} trailers")
 
-        return {
+        return json_response(request, shape_payload({
             "last_known_locations": result,
             "count": len(result),
             "generated_at": get_current_timestamps()["timestamp_EST"]
-        }
+        }, shape, ["last_known_locations"]))
 
     except Exception as e:
         print(f"Error fetching last known locations: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch last known locations: {str(e)}")
 
 
+# Move history endpoint
+MOVE_HISTORY_MAX_LIMIT = 500
+
+
+@app.get("/move-history")
+def get_move_history(
+        request: Request,
+        trailer_id: Optional[str] = None,
+        email: Optional[str] = None,
+        user_id: Optional[str] = None,
+        location: Optional[str] = None,
+        door: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        shape: str = "records",
+):
+    """
+    Completed moves filtered by trailer, driver (email or user_id), destination
+    location and door, and a completed_at time range, newest first. Moves in
+    Firestore and in the archive are merged under a single cursor.
+
+    Args:
+    - start / end: ISO 8601 timestamps, start inclusive, end exclusive.
+    - limit: Page size (max 500).
+    - cursor: next_cursor from the previous page.
+    - shape: "records" (default) or "columnar".
+
+    Returns:
+    - A page of moves and the cursor for the next page (None on the last page).
+    """
+    validate_firebase_token(request)
+
+    if limit < 1 or limit > MOVE_HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MOVE_HISTORY_MAX_LIMIT}")
+
+    filters = {
+        field: value for field, value in {
+            "trailer_id": trailer_id,
+            "email": email,
+            "user_id": user_id,
+            "to_location": location,
+            "to_door": door,
+        }.items() if value
+    }
+
+    try:
+        moves, next_cursor = archive.query_move_history_tiers(
+            filters, start=start, end=end, limit=limit, cursor=cursor
+        )
+        return json_response(request, shape_payload(
+            {"moves": moves, "count": len(moves), "next_cursor": next_cursor}, shape, ["moves"]
+        ))
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error fetching move history: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch move history: {str(e)}")
+
+
 # Also add this helper endpoint to get trailer statistics
 @app.get("/trailer-statistics")
-async def get_trailer_statistics(request: Request):
+@limit_concurrency("statistics")
+def get_trailer_statistics(request: Request):
     """
     Gets general statistics about trailers and their movements.
 
@@ -388,7 +687,7 @@ async def get_trailer_statistics(request: Request):
             status = move_data.get("status", "unknown")
             timestamp = move_data.get("completed_at") or move_data.get("timestamp")
 
-            if not trailer_id:
+            if not trailer_id or is_tombstone(move_data):
                 continue
 
             # Keep track of the most recent status for each trailer
@@ -421,6 +720,10 @@ def delete_record(collection: str, id: str, request: Request):
     Deletes a record from the specified Firebase collection by ID.
     Now includes proper authentication validation.
 
+    The record is soft-deleted: it stays in place as a tombstone (deleted=True)
+    so sync clients and caches see the deletion. The compact_tombstones job
+    purges tombstones later and cascades to dependent records.
+
     Args:
     - collection (str): The Firebase collection name.
     - id (str): The document ID to delete.
@@ -430,7 +733,8 @@ def delete_record(collection: str, id: str, request: Request):
     - Success message or error.
     """
     # Validate the requesting user's Firebase token
-    validate_firebase_token(request)
+    decoded_token = validate_firebase_token(request)
+    require_role(decoded_token, "admin")
 
     try:
         print(f"Attempting to delete record ID: {id} from collection: {collection}")
@@ -438,24 +742,43 @@ def delete_record(collection: str, id: str, request: Request):
         document_ref = db.collection(collection).document(id)
         doc = document_ref.get()
 
-        if not doc.exists:
+        if not doc.exists or is_tombstone(doc.to_dict()):
             print(f"Record with ID {id} not found in {collection}")
             raise HTTPException(status_code=404, detail="Record not found.")
 
-        # Special handling for user_master - also delete from Firebase Auth
+        # Special handling for user_master - disable in Firebase Auth right away,
+        # the Auth account itself is deleted by the next compaction
         if collection == "user_master":
             try:
-                # Delete from Firebase Authentication as well
-                auth.delete_user(id)  # The id should be the Firebase Auth UID
-                print(f"User {id} deleted from Firebase Auth")
+                auth.update_user(id, disabled=True)  # The id should be the Firebase Auth UID
+                print(f"User {id} disabled in Firebase Auth")
             except auth.UserNotFoundError:
                 print(f"User {id} not found in Firebase Auth (might already be deleted)")
             except Exception as auth_error:
-                print(f"Error deleting user from Firebase Auth: {auth_error}")
-                # Continue with Firestore deletion even if Auth deletion fails
+                print(f"Error disabling user in Firebase Auth: {auth_error}")
+                # Continue with Firestore deletion even if Auth update fails
+            profile_cache.pop(id)
 
-        # Delete from Firestore
-        document_ref.delete()
+        # Mark as deleted in Firestore
+        timestamps = get_current_timestamps()
+        tombstone = {
+            "deleted": True,
+            "deleted_at": timestamps["timestamp"],
+            "deleted_by": decoded_token.get("email"),
+            "updated_at": timestamps["timestamp"],
+            "updated_at_EST": timestamps["timestamp_EST"],
+        }
+        document_ref.update(tombstone)
+
+        if collection == "moves":
+            move = {"id": id, **doc.to_dict(), **tombstone}
+            occupancy_index.apply_move(move)
+            move_queue.apply_move(move)
+        elif collection == "trailer_master":
+            # Its moves are tombstoned by the next compaction, the door is free now
+            occupancy_index.vacate(str(doc.to_dict().get("id") or id))
+        elif collection == "locations":
+            location_changed(id)
         print(f"Record with ID {id} successfully deleted from {collection}")
 
         return {"message": f"Record with ID {id} successfully deleted from {collection}."}
@@ -484,7 +807,8 @@ def update_record(collection: str, id: str, update_data: dict, request: Request)
     - Success message or error.
     """
     # Validate the requesting user's Firebase token
-    validate_firebase_token(request)
+    decoded_token = validate_firebase_token(request)
+    require_write_access(decoded_token, collection)
 
     try:
         print(f"Attempting to update record ID: {id} in collection: {collection}")
@@ -493,10 +817,15 @@ def update_record(collection: str, id: str, update_data: dict, request: Request)
         document_ref = db.collection(collection).document(id)
         doc = document_ref.get()
 
-        if not doc.exists:
+        if not doc.exists or is_tombstone(doc.to_dict()):
             print(f"Record with ID {id} not found in {collection}")
             raise HTTPException(status_code=404, detail="Record not found.")
 
+        try:
+            update_data = validate_record(collection, update_data, partial=True)
+        except ValidationError as e:
+            raise validation_http_error(e)
+
         # Add timestamp for the update
         timestamps = get_current_timestamps()
         update_data.update({
@@ -506,6 +835,10 @@ def update_record(collection: str, id: str, update_data: dict, request: Request)
 
         # Update the document
         document_ref.update(update_data)
+        if collection == "user_master":
+            sync_user_role(id, update_data)
+        elif collection == "locations":
+            location_changed(id)
         print(f"Record with ID {id} successfully updated in {collection}")
 
         return {"message": f"Record with ID {id} successfully updated in {collection}."}
@@ -520,13 +853,15 @@ def update_record(collection: str, id: str, update_data: dict, request: Request)
 
 
 # Upload Excel endpoint
-@app.post("/upload-excel")
-async def upload_excel(
+@app.post("/upload-excel", status_code=202)
+@limit_concurrency("upload-excel")
+def upload_excel(
         request: Request,
         file: UploadFile = File(None),
         collection: str = Form(None)
 ):
-    validate_firebase_token(request)
+    decoded_token = validate_firebase_token(request)
+    require_role(decoded_token, "admin")
     try:
         if not file:
             raise HTTPException(status_code=400, detail="No file provided")
@@ -536,20 +871,25 @@ async def upload_excel(
 
         print(f"File received: {file.filename}, Collection: {collection}")
 
-        # Read and process Excel file
-        contents = await file.read()
-        df = pd.read_excel(contents)
-        print(f"DataFrame loaded with {len(df)} rows")
+        # Keep the file on disk so the import survives a restart, then run it as a job
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        file_path = os.path.join(JOBS_DIR, f"upload_{uuid.uuid4().hex}.xlsx")
+        with open(file_path, "wb") as upload:
+            shutil.copyfileobj(file.file, upload)
 
-        # Convert to dict and add timestamps
-        data = df.to_dict(orient="records")
-        for item in data:
-            timestamps = get_current_timestamps()
-            item.update(timestamps)
+        job = job_runner.submit("import_excel", {
+            "collection": collection,
+            "file_path": file_path,
+            "filename": file.filename,
+        }, submitted_by=decoded_token.get("email"))
 
-        upload_data(collection, data)
-        return {"message": f"Successfully uploaded {len(data)} records to {collection}."}
+        return {
+            "message": f"Upload of {file.filename} to {collection} started. Track it with /jobs/{job['id']}.",
+            "job_id": job["id"],
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in /upload-excel endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
@@ -557,7 +897,7 @@ async def upload_excel(
 
 # Temperature check endpoint - UPDATED WITH EMAIL LOGGING
 @app.post("/add-temp-check")
-async def add_temp_check(temp_check: dict, request: Request):
+def add_temp_check(temp_check: dict, request: Request):
     validate_firebase_token(request)
     try:
         print("Received temp_check data:", temp_check)
@@ -573,20 +913,150 @@ async def add_temp_check(temp_check: dict, request: Request):
         if "id" not in temp_check:
             temp_check["id"] = f"TC{int(datetime.utcnow().timestamp())}"
 
+        # Validate and coerce against the collection schema, like the bulk endpoint
+        try:
+            temp_check = validate_record("temperature_checks", temp_check)
+        except ValidationError as e:
+            raise validation_http_error(e)
+
         # Save to Firestore (automatically includes email field if provided)
         db.collection("temperature_checks").document(temp_check["id"]).set(temp_check)
         print("Data written to Firestore:", temp_check)
 
         return {"message": f"Temperature check added with ID {temp_check['id']}."}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error in /add-temp-check endpoint:", str(e))
         raise HTTPException(status_code=500, detail=f"Failed to add temperature check: {str(e)}")
 
 
+# Bulk temperature check ingestion
+def reject_constant(name):
+    # json.loads accepts NaN and Infinity, which are not valid readings
+    raise ValueError(f"{name} is not a valid number")
+
+
+def parse_temp_readings(body: bytes, content_type: str):
+    """
+    Parses a bulk temperature check payload. Accepts a JSON array, an object
+    with a "readings" array, or NDJSON (one reading per line).
+    """
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return [json.loads(line, parse_constant=reject_constant) for line in body.splitlines() if line.strip()]
+
+    payload = json.loads(body or b"[]", parse_constant=reject_constant)
+    if isinstance(payload, dict):
+        # A lone reading would otherwise be accepted as an empty batch
+        if not isinstance(payload.get("readings"), list):
+            raise ValueError('Expected a list of readings or an object with a "readings" list')
+        payload = payload["readings"]
+    if not isinstance(payload, list):
+        raise ValueError("Expected a list of readings")
+    return payload
+
+
+def normalize_reading_timestamp(value):
+    """Converts ISO strings or epoch seconds/milliseconds to an aware datetime in TIME_ZONE."""
+    if value in (None, ""):
+        return datetime.now(TIME_ZONE)
+    if isinstance(value, bool):
+        # bool is an int, true would be read as epoch second 1
+        raise ValueError("timestamp must be an ISO string or epoch seconds/milliseconds")
+    if isinstance(value, (int, float)):
+        # Reefer units report epoch seconds, some probes epoch milliseconds
+        seconds = value / 1000 if value > 1e11 else value
+        try:
+            return datetime.fromtimestamp(seconds, TIME_ZONE)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError(f"timestamp {value} is out of range")
+
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        # Naive timestamps are UTC, matching get_current_timestamps
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(TIME_ZONE)
+
+
+def validate_temp_reading(reading):
+    """Validates a reading against the temperature_checks schema and coerces its types."""
+    if not isinstance(reading, dict):
+        raise ValueError("Reading must be an object")
+
+    timestamp = normalize_reading_timestamp(reading.get("timestamp"))
+    item = validate_record("temperature_checks", {**reading, "timestamp": timestamp.isoformat()})
+    trailer_id = item["trailer_id"]
+
+    # Deterministic ID, so a replayed reading overwrites itself instead of duplicating
+    item["id"] = f"TC_{trailer_id}_{int(timestamp.timestamp() * 1000)}"
+    return item
+
+
+def ingest_temp_readings(readings):
+    """Validates, de-duplicates and writes parsed readings. Returns the /add-temp-checks response."""
+    accepted = {}
+    duplicates = 0
+    errors = []
+
+    for index, reading in enumerate(readings):
+        try:
+            item = validate_temp_reading(reading)
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+            continue
+
+        if item["id"] in accepted:
+            duplicates += 1
+            continue
+        accepted[item["id"]] = item
+
+    written = upload_data("temperature_checks", list(accepted.values()))
+    print(f"Bulk temperature checks: {written} written, {duplicates} duplicates, {len(errors)} rejected")
+
+    return {
+        "message": f"Added {written} temperature checks.",
+        "written": written,
+        "duplicates": duplicates,
+        "rejected": len(errors),
+        "errors": errors,
+    }
+
+
+@app.post("/add-temp-checks")
+async def add_temp_checks(request: Request):
+    """
+    Bulk ingestion of temperature readings from reefer units and handheld probes.
+
+    Accepts a JSON array, {"readings": [...]} or NDJSON
+    (Content-Type: application/x-ndjson). Readings are validated against the
+    temperature_checks schema, de-duplicated by (trailer_id, timestamp) and
+    written in batched commits.
+
+    Returns:
+    - Counts of written, duplicate and rejected readings, with per-reading errors.
+    """
+    validate_firebase_token(request)
+
+    try:
+        body = await request.body()
+        readings = parse_temp_readings(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid readings payload: {str(e)}")
+
+    try:
+        # Validation and the batch commits block, so they run off the event loop
+        return await run_in_threadpool(ingest_temp_readings, readings)
+
+    except Exception as e:
+        print("Error in /add-temp-checks endpoint:", str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to add temperature checks: {str(e)}")
+
+
 # Dashboard data endpoint
 @app.get("/dashboard-data")
-async def get_dashboard_data(request: Request):
+@limit_concurrency("dashboard-data")
+def get_dashboard_data(request: Request, shape: str = "records"):
     validate_firebase_token(request)
     try:
         def fetch_collection_data(collection_name, filters=None, order_by=None, limit=None):
@@ -598,13 +1068,13 @@ async def get_dashboard_data(request: Request):
                     query = query.where(field, operator, value)
 
             if order_by:
-                query = query.order_by(order_by, direction=db.Query.DESCENDING)
+                query = query.order_by(order_by, direction=firestore.Query.DESCENDING)
 
             if limit:
                 query = query.limit(limit)
 
             docs = query.stream()
-            return [doc.to_dict() for doc in docs]
+            return [data for data in (doc.to_dict() for doc in docs) if not is_tombstone(data)]
 
         # Fetch data
         open_moves = fetch_collection_data("moves", filters=[("status", "==", "open")])
@@ -614,45 +1084,629 @@ async def get_dashboard_data(request: Request):
         active_yard_users = fetch_collection_data("user_master", filters=[("role", "==", "yard")])
         temp_checks = fetch_collection_data("temperature_checks", order_by="timestamp", limit=10)
 
-        return {
+        return json_response(request, shape_payload({
             "open_moves": open_moves,
             "completed_moves": completed_moves,
             "active_users": [user.get("id", "") for user in active_yard_users],
             "temp_checks": temp_checks,
-        }
+        }, shape, ["open_moves", "completed_moves", "temp_checks"]))
     except Exception as e:
         print(f"Error fetching dashboard data: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch dashboard data.")
 
 
+# Door occupancy endpoints
+@app.get("/occupancy")
+def get_occupancy(location: str, door: str, request: Request):
+    """
+    Returns what is at a door right now: the trailer occupying it (if any) and
+    the active move heading there (if any).
+    """
+    validate_firebase_token(request)
+    result = occupancy_index.at_door(location, door)
+    result["occupied"] = bool(result["occupant"] or result["reserved_by"])
+    return result
+
+
+@app.get("/free-doors")
+def get_free_doors(location: str, request: Request):
+    """
+    Returns the doors at a location with no trailer and no incoming move. Doors
+    come from the location's doors field or config.LOCATION_DOORS; a location
+    with none configured is a 404 rather than an empty list.
+    """
+    validate_firebase_token(request)
+    if not occupancy_index.has_doors(location):
+        raise HTTPException(status_code=404, detail=f"No doors are configured for {location.upper()}. "
+                                                    "List them in the location's doors field.")
+    doors = occupancy_index.free_doors(location)
+    return {"location": location.upper(), "free_doors": doors, "count": len(doors)}
+
+
+@app.get("/trailer-location")
+def get_trailer_location(trailer_id: str, request: Request):
+    """Returns the door a trailer was last moved to, according to the occupancy index."""
+    validate_firebase_token(request)
+    location = occupancy_index.trailer_location(trailer_id)
+    if not location:
+        raise HTTPException(status_code=404, detail=f"No known door for trailer {trailer_id}")
+    return {"trailer_id": trailer_id, **location}
+
+
+# Move queue endpoints
+@app.post("/moves/claim")
+def claim_move(request: Request):
+    """
+    Leases the next best open move to the requesting driver. The lease must be
+    acknowledged with /moves/{move_id}/ack before it expires, or the move goes
+    back in the queue. Claiming again while holding a lease returns the same move.
+
+    Returns:
+    - The move and its lease expiry (epoch seconds), or move=None if the queue is empty.
+    """
+    decoded_token = validate_firebase_token(request)
+    driver = decoded_token.get("uid")
+
+    try:
+        while True:
+            lease = move_queue.claim(driver, decoded_token.get("email"))
+            if not lease:
+                return {"move": None, "message": "No open moves."}
+
+            # A client may have picked the move up before the listener caught up
+            move_id = lease["move"]["id"]
+            doc = db.collection("moves").document(move_id).get()
+            current = doc.to_dict() if doc.exists else {"status": "deleted"}
+            if is_tombstone(current):
+                current["status"] = "deleted"
+            if (current.get("status") or "open") == "open":
+                print(f"Move {move_id} leased to {decoded_token.get('email')}")
+                return lease
+            move_queue.apply_move({"id": move_id, **current})
+
+    except Exception as e:
+        print(f"Error claiming move: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to claim move: {str(e)}")
+
+
+@firestore.transactional
+def transition_move(transaction, move_ref, expected_status, updates):
+    """Applies updates to a move only if it is still in the expected status."""
+    snapshot = move_ref.get(transaction=transaction)
+    if not snapshot.exists or is_tombstone(snapshot.to_dict()):
+        raise HTTPException(status_code=404, detail="Move not found.")
+    move = snapshot.to_dict()
+    if (move.get("status") or "open") != expected_status:
+        raise HTTPException(status_code=409, detail=f"Move is {move.get('status')}, expected {expected_status}.")
+    updates = {**updates, **sync.change_stamps()}
+    transaction.update(move_ref, updates)
+    return {"id": snapshot.id, **move, **updates}
+
+
+@app.post("/moves/{move_id}/ack")
+def acknowledge_move(move_id: str, request: Request):
+    """Acknowledges a lease by marking the move as picked up by the driver holding it."""
+    decoded_token = validate_firebase_token(request)
+    driver = decoded_token.get("uid")
+
+    if not move_queue.lease_for(move_id, driver):
+        raise HTTPException(status_code=409, detail="No active lease on this move. Claim a move first.")
+
+    try:
+        move = transition_move(db.transaction(), db.collection("moves").document(move_id), "open", {
+            "status": "picked up",
+            "picked_up_at": get_current_timestamps()["timestamp"],
+            "user_id": driver,
+            "email": decoded_token.get("email"),
+        })
+        move_queue.discard(move_id)
+        return {"message": f"Move {move_id} picked up.", "move": move}
+
+    except HTTPException:
+        move_queue.discard(move_id)
+        raise
+    except Exception as e:
+        print(f"Error acknowledging move {move_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to acknowledge move: {str(e)}")
+
+
+@app.post("/moves/{move_id}/release")
+def release_move(move_id: str, request: Request):
+    """Gives a leased move back to the queue."""
+    decoded_token = validate_firebase_token(request)
+    if not move_queue.release(move_id, decoded_token.get("uid")):
+        raise HTTPException(status_code=409, detail="No active lease on this move.")
+    return {"message": f"Move {move_id} released."}
+
+
+def require_move_driver(move, decoded_token, action):
+    """Raises 403 unless the user picked up the move or is an admin."""
+    if move.get("user_id") != decoded_token.get("uid") and get_role(decoded_token) != "admin":
+        raise HTTPException(status_code=403, detail=f"Only the driver who picked up this move can {action} it.")
+
+
+@app.post("/moves/{move_id}/reopen")
+def reopen_move(move_id: str, request: Request):
+    """Puts a move the driver picked up back in the queue as open."""
+    decoded_token = validate_firebase_token(request)
+
+    try:
+        move_ref = db.collection("moves").document(move_id)
+        doc = move_ref.get()
+        if not doc.exists or is_tombstone(doc.to_dict()):
+            raise HTTPException(status_code=404, detail="Move not found.")
+        require_move_driver(doc.to_dict(), decoded_token, "reopen")
+
+        move = transition_move(db.transaction(), move_ref, "picked up", {
+            "status": "open",
+            "user_id": None,
+            "email": None,
+        })
+        move_queue.apply_move(move)
+        return {"message": f"Move {move_id} reopened.", "move": move}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error reopening move {move_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to reopen move: {str(e)}")
+
+
+@app.post("/moves/{move_id}/complete")
+def complete_move(move_id: str, destination: CompleteMoveRequest, request: Request):
+    """
+    Completes a picked-up move at its destination door. Only the driver who
+    picked it up (or an admin) may complete it. Rejected with 409 if the door is
+    occupied by another trailer or is the destination of another move.
+    """
+    decoded_token = validate_firebase_token(request)
+
+    try:
+        move_ref = db.collection("moves").document(move_id)
+        doc = move_ref.get()
+        if not doc.exists or is_tombstone(doc.to_dict()):
+            raise HTTPException(status_code=404, detail="Move not found.")
+        require_move_driver(doc.to_dict(), decoded_token, "complete")
+
+        conflict = occupancy_index.try_reserve(
+            move_id, destination.to_location, destination.to_door,
+            trailer_id=doc.to_dict().get("trailer_id"),
+        )
+        if conflict:
+            raise HTTPException(status_code=409, detail=conflict)
+
+        try:
+            move = transition_move(db.transaction(), move_ref, "picked up", {
+                "to_location": destination.to_location,
+                "to_door": destination.to_door,
+                "status": "completed",
+                "completed_at": get_current_timestamps()["timestamp"],
+            })
+        except Exception:
+            # Back to the reservation the move had before this request
+            occupancy_index.apply_move({"id": move_id, **doc.to_dict()})
+            raise
+        occupancy_index.apply_move(move)
+        move_queue.discard(move_id)
+        return {"message": f"Move {move_id} completed.", "move": move}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error completing move {move_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to complete move: {str(e)}")
+
+
+@app.get("/moves/current")
+def get_current_move(request: Request):
+    """
+    The requesting driver's work in progress: the move they have picked up, or
+    the move they hold a lease on. Lets the driver app resume after a reload.
+    """
+    decoded_token = validate_firebase_token(request)
+    driver = decoded_token.get("uid")
+
+    try:
+        picked_up = db.collection("moves").where("user_id", "==", driver) \
+            .where("status", "==", "picked up").limit(5).stream()
+        for doc in picked_up:
+            if not is_tombstone(doc.to_dict()):
+                return {"move": {"id": doc.id, **doc.to_dict()}, "lease": None}
+        lease = move_queue.lease_of(driver)
+        return {"move": None, "lease": lease}
+
+    except Exception as e:
+        print(f"Error fetching current move: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch current move: {str(e)}")
+
+
+@app.get("/moves/queue-stats")
+def get_move_queue_stats(request: Request):
+    """Queue depth, active leases and how long moves waited before being claimed."""
+    validate_firebase_token(request)
+    return move_queue.stats()
+
+
+# Delta sync endpoint
+def apply_offline_write(write: OfflineWrite, decoded_token):
+    """
+    Creates a record queued by a client while offline. The document ID is derived
+    from the idempotency key and written with create(), so a replayed write is
+    reported as a duplicate instead of adding a second record.
+    """
+    if write.collection not in SYNC_WRITABLE_COLLECTIONS:
+        return {"idempotency_key": write.idempotency_key, "status": "rejected",
+                "error": f"Offline writes to {write.collection} are not allowed"}
+
+    key_hash = hashlib.sha256(f"{write.collection}:{write.idempotency_key}".encode()).hexdigest()[:24]
+    timestamps = get_current_timestamps()
+    try:
+        if write.collection == "temperature_checks":
+            item = validate_temp_reading(write.data)
+        else:
+            item = validate_record(write.collection, {**timestamps, **write.data})
+    except ValueError as e:
+        return {"idempotency_key": write.idempotency_key, "status": "rejected", "error": str(e)}
+
+    item.update({
+        "id": f"{write.collection}_{key_hash}",
+        "idempotency_key": write.idempotency_key,
+        **sync.change_stamps(created=True),
+    })
+    item.setdefault("user_id", decoded_token.get("uid"))
+    item.setdefault("email", decoded_token.get("email"))
+    if write.collection == "moves":
+        # Same default as /add-record, so the move is queued again after a restart
+        item["status"] = item.get("status") or "open"
+
+    # Same door reservation as /add-record: the door may have filled up while the client was offline
+    reserved = False
+    if write.collection == "moves":
+        destination = move_destination(item)
+        conflict = destination and occupancy_index.try_reserve(
+            item["id"], *destination, trailer_id=item.get("trailer_id")
+        )
+        if conflict:
+            return {"idempotency_key": write.idempotency_key, "status": "rejected", "error": conflict}
+        reserved = bool(destination)
+
+    doc_ref = db.collection(write.collection).document(item["id"])
+    try:
+        doc_ref.create(item)
+    except AlreadyExists:
+        if reserved:
+            # A replay: the index follows the move as first written, not this copy
+            existing = doc_ref.get()
+            occupancy_index.release(item["id"])
+            occupancy_index.apply_move({"id": existing.id, **(existing.to_dict() or {})})
+        return {"idempotency_key": write.idempotency_key, "status": "duplicate", "id": item["id"]}
+    except Exception:
+        if reserved:
+            occupancy_index.release(item["id"])
+        raise
+
+    if write.collection == "moves":
+        occupancy_index.apply_move(item)
+        move_queue.apply_move(item)
+    return {"idempotency_key": write.idempotency_key, "status": "created", "id": item["id"]}
+
+
+@app.post("/sync")
+def sync_endpoint(sync_request: SyncRequest, request: Request):
+    """
+    Delta sync for handheld clients.
+
+    The client sends the token from its last sync (none on first sync) and any
+    writes it queued while offline. Writes are applied first, then the response
+    lists the documents created, updated and deleted since the token in each
+    synced collection, plus a new token for the next sync.
+
+    Returns:
+    - token, full (true when a full snapshot was sent), per-collection changes and
+      the outcome of each offline write (created, duplicate or rejected).
+    """
+    decoded_token = validate_firebase_token(request)
+
+    collections = sync_request.collections or list(SYNC_COLLECTIONS)
+    unknown = [collection for collection in collections if collection not in SYNC_COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Collections not available for sync: {unknown}")
+
+    try:
+        write_results = [apply_offline_write(write, decoded_token) for write in sync_request.writes]
+        token, changes, full = sync.collect_changes(sync_request.token, collections)
+        print(f"Sync for {decoded_token.get('email')}: {len(write_results)} offline writes, "
+              f"{sum(len(c['created']) + len(c['updated']) for c in changes.values())} changed documents")
+
+        return json_response(request, {
+            "token": token,
+            "full": full,
+            "changes": changes,
+            "writes": write_results,
+        })
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in /sync endpoint: {e}")
+        raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
+
+
+# Background jobs
+@job_type("import_excel")
+def import_excel_job(ctx, collection, file_path, filename=None):
+    """
+    Validates and uploads a spreadsheet in batches, checkpointing after each one.
+    Rows without an ID get one derived from the job, so a resumed import
+    overwrites the rows it already wrote instead of duplicating them.
+    """
+    # pandas/openpyxl are only needed here, so they load on first upload
+    import pandas as pd
+    df = pd.read_excel(file_path)
+    print(f"DataFrame loaded with {len(df)} rows from {filename}")
+
+    try:
+        df = validate_dataframe(collection, df)
+    except ValidationError as e:
+        # Same details the upload used to return as a 422, kept in the job's result
+        os.remove(file_path)
+        raise JobFailed(str(e), result={"error_count": e.error_count, "errors": e.errors})
+    data = df.to_dict(orient="records")
+
+    for offset in range(ctx.checkpoint.get("rows_done", 0), len(data), BATCH_LIMIT):
+        ctx.check_cancelled()
+        chunk = data[offset:offset + BATCH_LIMIT]
+        timestamps = get_current_timestamps()
+        for row_number, item in enumerate(chunk, start=offset):
+            item.update(timestamps)
+            item.update(sync.change_stamps(created=True))
+            if not item.get("id"):
+                item["id"] = f"{collection}_{ctx.job_id[:12]}_{row_number}"
+        upload_data(collection, chunk)
+        ctx.progress(offset + len(chunk), len(data), checkpoint={"rows_done": offset + len(chunk)})
+
+    os.remove(file_path)
+    return {"message": f"Successfully uploaded {len(data)} records to {collection}.", "records": len(data)}
+
+
+@job_type("migrate_locations")
+def migrate_locations_job(ctx):
+    from migrate_locations import migrate_locations
+    added = migrate_locations(interactive=False, progress=lambda done, total: ctx.progress(done, total))
+    locations_cache.clear()
+    return {"added": added}
+
+
+# Status spellings written by older clients, mapped to the canonical statuses
+MOVE_STATUS_ALIASES = {
+    "": "open",
+    "new": "open",
+    "picked_up": "picked up",
+    "pickedup": "picked up",
+    "in progress": "picked up",
+    "complete": "completed",
+    "done": "completed",
+}
+
+
+@job_type("normalize_move_status")
+def normalize_move_status_job(ctx):
+    """Rewrites missing or non-canonical move statuses, in batches, resuming after the last page."""
+    moves_ref = db.collection("moves")
+    scanned = ctx.checkpoint.get("scanned", 0)
+    updated = ctx.checkpoint.get("updated", 0)
+    last_id = ctx.checkpoint.get("last_id")
+    cursor = moves_ref.document(last_id).get() if last_id else None
+
+    while True:
+        ctx.check_cancelled()
+        query = moves_ref.order_by("__name__").limit(BATCH_LIMIT)
+        if cursor:
+            query = query.start_after(cursor)
+        docs = list(query.stream())
+        if not docs:
+            break
+
+        batch = db.batch()
+        changed = 0
+        timestamps = get_current_timestamps()
+        for doc in docs:
+            raw = str(doc.to_dict().get("status") or "").strip().lower()
+            status = MOVE_STATUS_ALIASES.get(raw, raw)
+            if status != doc.to_dict().get("status"):
+                batch.update(doc.reference, {"status": status, "updated_at": timestamps["timestamp"]})
+                changed += 1
+        if changed:
+            batch.commit()
+
+        scanned += len(docs)
+        updated += changed
+        cursor = docs[-1]
+        last_id = cursor.id
+        ctx.progress(scanned, None, f"{updated} updated",
+                     checkpoint={"scanned": scanned, "updated": updated, "last_id": last_id})
+
+    return {"scanned": scanned, "updated": updated}
+
+
+@job_type("rebuild_indexes")
+def rebuild_indexes_job(ctx):
+    """Rebuilds the in-memory occupancy index, move queue and locations cache from Firestore."""
+    occupancy_index.rebuild(db)
+    ctx.progress(1, 3, "occupancy index rebuilt")
+    move_queue.load(db)
+    ctx.progress(2, 3, "move queue reloaded")
+    locations_cache.clear()
+    load_locations()
+    return {"occupancy_loaded": occupancy_index.loaded, "move_queue": move_queue.stats()}
+
+
+@job_type("sync_role_claims")
+def sync_role_claims_job(ctx):
+    """Backfills role custom claims for every user in user_master."""
+    users = [doc for doc in db.collection("user_master").stream()]
+    updated = 0
+    for index, doc in enumerate(users):
+        ctx.check_cancelled()
+        role = doc.to_dict().get("role")
+        if role:
+            try:
+                set_role_claim(doc.id, role)
+                updated += 1
+            except auth.UserNotFoundError:
+                print(f"User {doc.id} not found in Firebase Auth, skipping role claim")
+        ctx.progress(index + 1, len(users))
+    return {"users": len(users), "claims_set": updated}
+
+
+@job_type("compact_tombstones")
+def compact_tombstones_job(ctx, retention_days=TOMBSTONE_RETENTION_DAYS):
+    """
+    Cascades new tombstones to the records that reference them (which become
+    tombstones too), then purges tombstones older than the retention period.
+    Deleted users are removed from Firebase Auth in the cascade pass, so their
+    email can be registered again while the tombstone is kept for sync.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    collections = list(dict.fromkeys([*COLLECTION_SCHEMA, "locations"]))
+    cascaded = 0
+    purged = 0
+
+    for index, collection in enumerate(collections):
+        ctx.check_cancelled()
+        tombstones = list(db.collection(collection).where("deleted", "==", True).stream())
+
+        for doc in tombstones:
+            record = doc.to_dict()
+            if record.get("cascaded") or (collection not in CASCADE_DELETES and collection != "user_master"):
+                continue
+            if collection == "user_master":
+                try:
+                    auth.delete_user(doc.id)
+                    print(f"User {doc.id} deleted from Firebase Auth")
+                except auth.UserNotFoundError:
+                    pass
+            key = record.get("id") or doc.id
+            timestamps = get_current_timestamps()
+            tombstone = {
+                "deleted": True,
+                "deleted_at": timestamps["timestamp"],
+                "deleted_by": f"cascade:{collection}/{doc.id}",
+                "updated_at": timestamps["timestamp"],
+            }
+            for dependent, field in CASCADE_DELETES.get(collection, []):
+                dependents = [dependent_doc for dependent_doc in
+                              db.collection(dependent).where(field, "==", key).stream()
+                              if not is_tombstone(dependent_doc.to_dict())]
+                cascaded += tombstone_documents([dependent_doc.reference for dependent_doc in dependents], tombstone)
+                # Completed moves are outside the active moves listener, so update the indexes here
+                if dependent == "moves":
+                    for dependent_doc in dependents:
+                        move = {"id": dependent_doc.id, **dependent_doc.to_dict(), **tombstone}
+                        occupancy_index.apply_move(move)
+                        move_queue.apply_move(move)
+            if collection == "trailer_master":
+                occupancy_index.vacate(str(key))
+            doc.reference.update({"cascaded": True})
+
+        expired = [doc for doc in tombstones if str(doc.to_dict().get("deleted_at") or "") < cutoff]
+        purged += delete_documents([doc.reference for doc in expired])
+        ctx.progress(index + 1, len(collections), f"{purged} purged, {cascaded} cascaded")
+
+    return {"purged": purged, "cascaded": cascaded}
+
+
+@job_type("archive_history")
+def archive_history_job(ctx, collections=None):
+    """Moves old completed moves and temperature checks from Firestore into the Parquet archive."""
+    collections = collections or list(ARCHIVE_COLLECTIONS)
+    archived = {}
+    for index, collection in enumerate(collections):
+        ctx.check_cancelled()
+
+        def progress(count):
+            ctx.check_cancelled()
+            ctx.progress(index, len(collections), f"{count} {collection} records archived")
+
+        archived[collection] = archive.archive_collection(collection, progress=progress)
+    return {"archived": archived}
+
+
+# Job types that can be started directly; imports go through /upload-excel
+SUBMITTABLE_JOB_TYPES = [
+    "migrate_locations",
+    "normalize_move_status",
+    "rebuild_indexes",
+    "sync_role_claims",
+    "compact_tombstones",
+    "archive_history",
+]
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(job_request: JobRequest, request: Request):
+    """
+    Starts a background job. Returns the job, whose id can be polled at /jobs/{id}.
+
+    Types: migrate_locations, normalize_move_status, rebuild_indexes, sync_role_claims,
+    compact_tombstones, archive_history.
+    """
+    decoded_token = validate_firebase_token(request)
+    require_role(decoded_token, "admin")
+
+    if job_request.type not in SUBMITTABLE_JOB_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown job type. Available: {SUBMITTABLE_JOB_TYPES}")
+    return job_runner.submit(job_request.type, job_request.params, submitted_by=decoded_token.get("email"))
+
+
+@app.get("/jobs")
+def list_jobs(request: Request, status: Optional[str] = None, limit: int = 50):
+    """Most recent jobs first, optionally filtered by status."""
+    require_role(validate_firebase_token(request), "admin")
+    return {"jobs": job_runner.list(status=status, limit=min(limit, 500))}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, request: Request):
+    """Status, progress, result or error of a job."""
+    require_role(validate_firebase_token(request), "admin")
+    job = job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str, request: Request):
+    """Cancels a queued job, or asks a running job to stop at its next checkpoint."""
+    require_role(validate_firebase_token(request), "admin")
+    job = job_runner.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
 # Trailer validation endpoint
 @app.get("/validate-trailer")
 def validate_trailer(trailer_id: str, request: Request):
     validate_firebase_token(request)
     try:
         trailers = db.collection("trailer_master").where("id", "==", trailer_id).get()
-        return {"exists": len(list(trailers)) > 0}
+        return {"exists": any(not is_tombstone(trailer.to_dict()) for trailer in trailers)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Startup event
-@app.on_event("startup")
-async def startup_event():
-    routes = [route.path for route in app.routes]
-    print("Registered routes:", routes)
-    print("LOCATIONS:", LOCATIONS)
-    print("Backend server started successfully!")
-
 # update record
 # Add this endpoint to your Backend/main.py file
 
 @app.put("/update-record")
-async def update_record(record: Record, request: Request):
-    validate_firebase_token(request)
+def update_record(record: Record, request: Request):
+    decoded_token = validate_firebase_token(request)
     try:
         if not record or not record.data or not record.collection:
             raise HTTPException(status_code=400, detail="Invalid data or collection name.")
+        require_write_access(decoded_token, record.collection)
 
         if len(record.data) != 1:
             raise HTTPException(status_code=400, detail="Can only update one record at a time.")
@@ -662,6 +1716,11 @@ async def update_record(record: Record, request: Request):
         if not item.get("id"):
             raise HTTPException(status_code=400, detail="Record ID is required for updates.")
 
+        try:
+            item = validate_record(record.collection, item, partial=True)
+        except ValidationError as e:
+            raise validation_http_error(e)
+
         # Add update timestamp
         timestamps = get_current_timestamps()
         item["updated_at"] = timestamps["timestamp"]
@@ -673,9 +1732,15 @@ async def update_record(record: Record, request: Request):
         # Update the document
         doc_ref = db.collection(record.collection).document(item["id"])
         doc_ref.update(item)
+        if record.collection == "user_master":
+            sync_user_role(item["id"], item)
+        elif record.collection == "locations":
+            location_changed(item["id"])
 
         return {"message": f"Record updated successfully in {record.collection}."}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in /update-record endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Error updating record: {str(e)}")
@@ -8,10 +8,17 @@ from config import LOCATIONS
 from firebase_admin import firestore
 import uuid
 from datetime import datetime
+from sync import change_stamps
 
 
-def migrate_locations():
-    """Move hardcoded locations from config to Firestore"""
+def migrate_locations(interactive=True, progress=None):
+    """
+    Move hardcoded locations from config to Firestore.
+
+    Run non-interactively (as the migrate_locations background job) it adds
+    missing locations without asking, calling progress(done, total) per location.
+    Returns the number of locations added.
+    """
     print("Starting location migration...")
 
     try:
@@ -23,10 +30,11 @@ def migrate_locations():
             for loc in existing_locations:
                 print(f"  - {loc.to_dict().get('name', 'Unknown')}")
 
-            response = input("Do you want to proceed and add missing locations? (y/n): ")
-            if response.lower() != 'y':
-                print("Migration cancelled.")
-                return
+            if interactive:
+                response = input("Do you want to proceed and add missing locations? (y/n): ")
+                if response.lower() != 'y':
+                    print("Migration cancelled.")
+                    return 0
 
         # Get existing location names
         existing_names = [loc.to_dict().get('name', '') for loc in existing_locations]
@@ -35,14 +43,16 @@ def migrate_locations():
         locations_ref = db.collection("locations")
         added_count = 0
 
-        for location_name in LOCATIONS:
+        for index, location_name in enumerate(LOCATIONS):
+            if progress:
+                progress(index, len(LOCATIONS))
             if location_name not in existing_names:
                 location_data = {
                     "id": str(uuid.uuid4()),
                     "name": location_name,
                     "description": f"Migrated location: {location_name}",
                     "active": True,
-                    "created_at": datetime.utcnow().isoformat()
+                    **change_stamps(created=True),
                 }
 
                 # Use location name as document ID for easier retrieval
@@ -67,6 +77,8 @@ def migrate_locations():
             status = "✅ Active" if data.get('active', True) else "❌ Inactive"
             print(f"  - {data.get('name', 'Unknown')} {status}")
 
+        return added_count
+
     except Exception as e:
         print(f"❌ Migration failed: {e}")
         raise
@@ -0,0 +1,251 @@
+"""
+Server-side queue of open moves for yard drivers.
+
+Open moves are kept in a heap ordered by age, adjusted by urgency (reefer
+trailers, moves flagged urgent) and by the priority of the pickup location.
+Drivers claim the next move and get a lease on it; a lease that is not
+acknowledged (picked up) before it expires puts the move back in the queue.
+A driver who releases (skips) a move is not offered it again for a while.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from config import (
+    MOVE_LEASE_SECONDS,
+    MOVE_SKIP_SECONDS,
+    MOVE_LOCATION_PRIORITY,
+    REEFER_PRIORITY_SECONDS,
+    URGENT_PRIORITY_SECONDS,
+    TIME_ZONE,
+)
+
+# Formats the clients have used for move timestamps besides ISO 8601
+TIMESTAMP_FORMATS = ["%Y-%m-%d %I:%M:%S %p EST"]
+
+
+def parse_move_time(value):
+    """Returns epoch seconds for a move timestamp, or None if it can't be parsed."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            parsed = None
+            for fmt in TIMESTAMP_FORMATS:
+                try:
+                    parsed = datetime.strptime(text, fmt).replace(tzinfo=TIME_ZONE)
+                    break
+                except ValueError:
+                    continue
+            if parsed is None:
+                return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class MoveQueue:
+    def __init__(self, lease_seconds=MOVE_LEASE_SECONDS, skip_seconds=MOVE_SKIP_SECONDS):
+        self.lease_seconds = lease_seconds
+        self.skip_seconds = skip_seconds
+        self.reefer_trailers = set()
+        self._lock = threading.Lock()
+        self._heap = []              # (priority, seq, move_id)
+        self._entries = {}           # move_id -> {"move", "seq", "enqueued_at"}
+        self._leases = {}            # move_id -> {"driver", "email", "leased_at", "expires_at"}
+        self._driver_leases = {}     # driver -> move_id
+        self._skips = {}             # driver -> {move_id: skipped until}
+        self._counter = itertools.count()
+        self._waits = deque(maxlen=1000)
+        self.loaded = False
+
+    def priority(self, move):
+        """Lower is served first: the move's age, pulled forward by urgency bonuses in seconds."""
+        created = parse_move_time(move.get("created_at") or move.get("timestamp")) or time.time()
+        bonus = MOVE_LOCATION_PRIORITY.get(str(move.get("from_wh_yard") or "").upper(), 0)
+        if str(move.get("trailer_id")) in self.reefer_trailers:
+            bonus += REEFER_PRIORITY_SECONDS
+        if move.get("priority") == "urgent":
+            bonus += URGENT_PRIORITY_SECONDS
+        return created - bonus
+
+    # Membership
+
+    def push(self, move):
+        move_id = move.get("id")
+        if not move_id:
+            return
+        with self._lock:
+            seq = next(self._counter)
+            created = parse_move_time(move.get("created_at") or move.get("timestamp"))
+            previous = self._entries.get(move_id)
+            self._entries[move_id] = {
+                "move": move,
+                "seq": seq,
+                "enqueued_at": previous["enqueued_at"] if previous else (created or time.time()),
+            }
+            heapq.heappush(self._heap, (self.priority(move), seq, move_id))
+
+    def discard(self, move_id):
+        with self._lock:
+            self._entries.pop(move_id, None)
+            self._drop_lease(move_id)
+
+    def apply_move(self, move):
+        """Keeps queue membership in sync with a move document in any status."""
+        if (move.get("status") or "open") == "open" and move.get("deleted") is not True:
+            self.push(move)
+        else:
+            self.discard(move.get("id"))
+
+    # Leases
+
+    def _drop_lease(self, move_id):
+        lease = self._leases.pop(move_id, None)
+        if lease and self._driver_leases.get(lease["driver"]) == move_id:
+            del self._driver_leases[lease["driver"]]
+        return lease
+
+    def _expire_leases(self):
+        now = time.time()
+        for move_id, lease in list(self._leases.items()):
+            if lease["expires_at"] <= now:
+                self._drop_lease(move_id)
+                entry = self._entries.get(move_id)
+                if entry:
+                    # Back in the queue at its original priority
+                    heapq.heappush(self._heap, (self.priority(entry["move"]), entry["seq"], move_id))
+
+    def _skipped_by(self, driver):
+        now = time.time()
+        skips = self._skips.get(driver, {})
+        for move_id, until in list(skips.items()):
+            if until <= now or move_id not in self._entries:
+                del skips[move_id]
+        if not skips:
+            self._skips.pop(driver, None)
+        return skips
+
+    def _lease_response(self, move_id):
+        return {"move": self._entries[move_id]["move"], "lease_expires_at": self._leases[move_id]["expires_at"]}
+
+    def claim(self, driver, email=None):
+        """
+        Leases the best open move to a driver. A driver holding an unexpired lease
+        gets the same move back, so retried claims don't grab a second move.
+        Moves the driver skipped recently are passed over. Returns None when
+        there is nothing else to offer.
+        """
+        with self._lock:
+            self._expire_leases()
+
+            current = self._driver_leases.get(driver)
+            if current:
+                return self._lease_response(current)
+
+            skipped = self._skipped_by(driver)
+            passed_over = []
+            try:
+                while self._heap:
+                    item = heapq.heappop(self._heap)
+                    _, seq, move_id = item
+                    entry = self._entries.get(move_id)
+                    # Drop stale heap entries left behind by re-pushes and discards
+                    if not entry or entry["seq"] != seq or move_id in self._leases:
+                        continue
+                    if move_id in skipped:
+                        passed_over.append(item)
+                        continue
+                    return self._lease(driver, email, move_id, entry)
+                return None
+            finally:
+                # Moves skipped by this driver stay queued for everyone else
+                for item in passed_over:
+                    heapq.heappush(self._heap, item)
+
+    def _lease(self, driver, email, move_id, entry):
+        now = time.time()
+        self._leases[move_id] = {
+            "driver": driver,
+            "email": email,
+            "leased_at": now,
+            "expires_at": now + self.lease_seconds,
+        }
+        self._driver_leases[driver] = move_id
+        self._waits.append(now - entry["enqueued_at"])
+        return self._lease_response(move_id)
+
+    def lease_for(self, move_id, driver):
+        """Returns the unexpired lease on a move if it belongs to the driver."""
+        with self._lock:
+            self._expire_leases()
+            lease = self._leases.get(move_id)
+            return lease if lease and lease["driver"] == driver else None
+
+    def lease_of(self, driver):
+        """The driver's unexpired lease as returned by claim, or None."""
+        with self._lock:
+            self._expire_leases()
+            move_id = self._driver_leases.get(driver)
+            return self._lease_response(move_id) if move_id else None
+
+    def release(self, move_id, driver):
+        """
+        Gives a leased move back to the queue for other drivers; this driver
+        isn't offered it again for skip_seconds. Returns False if the driver
+        didn't hold it.
+        """
+        with self._lock:
+            lease = self._leases.get(move_id)
+            if not lease or lease["driver"] != driver:
+                return False
+            self._drop_lease(move_id)
+            self._skips.setdefault(driver, {})[move_id] = time.time() + self.skip_seconds
+            entry = self._entries.get(move_id)
+            if entry:
+                heapq.heappush(self._heap, (self.priority(entry["move"]), entry["seq"], move_id))
+            return True
+
+    # Stats
+
+    def stats(self):
+        with self._lock:
+            self._expire_leases()
+            waits = sorted(self._waits)
+
+            def percentile(p):
+                return round(waits[min(len(waits) - 1, int(len(waits) * p))], 1) if waits else None
+
+            return {
+                "queued": len(self._entries) - len(self._leases),
+                "leased": len(self._leases),
+                "claims_measured": len(waits),
+                "wait_seconds_p50": percentile(0.5),
+                "wait_seconds_p95": percentile(0.95),
+                "wait_seconds_max": round(waits[-1], 1) if waits else None,
+            }
+
+    # Loading
+
+    def load(self, db):
+        """Loads reefer trailers and the current open moves."""
+        self.reefer_trailers = {
+            str(doc.to_dict().get("id") or doc.id)
+            for doc in db.collection("trailer_master").where("reefer", "==", True).stream()
+            if doc.to_dict().get("deleted") is not True
+        }
+        for doc in db.collection("moves").where("status", "==", "open").stream():
+            self.apply_move({"id": doc.id, **doc.to_dict()})
+        self.loaded = True
+        print(f"Move queue loaded: {len(self._entries)} open moves, {len(self.reefer_trailers)} reefer trailers")
+
+
+move_queue = MoveQueue()
@@ -0,0 +1,242 @@
+"""
+In-memory door/location occupancy index.
+
+Keeps track of which trailer sits at which (location, door) based on completed
+moves, and which doors are already the destination of a move that is still
+open or picked up. Every lookup is a dict/set access, so move creation can
+check its destination without scanning the moves collection.
+"""
+
+import threading
+from config import LOCATION_DOORS, ACTIVE_MOVE_STATUSES
+
+
+def slot_key(location, door):
+    """Normalizes a (location, door) pair. Returns None if either part is missing."""
+    location = str(location or "").strip().upper()
+    door = str(door or "").strip()
+    if not location or not door:
+        return None
+    return location, door
+
+
+def move_destination(move):
+    # moves.jsx writes to_location on completion, /add-record moves carry to_wh_yard
+    return slot_key(move.get("to_location") or move.get("to_wh_yard"), move.get("to_door"))
+
+
+def move_origin(move):
+    return slot_key(move.get("from_wh_yard"), move.get("from_door"))
+
+
+class OccupancyIndex:
+    def __init__(self, location_doors=None):
+        self._lock = threading.RLock()
+        self._slots = {}         # (location, door) -> {"trailer_id", "move_id", "since"}
+        self._trailers = {}      # trailer_id -> (location, door)
+        self._reserved = {}      # (location, door) -> move_id of an active move heading there
+        self._reservations = {}  # move_id -> (location, door)
+        self._doors = {}         # location -> set of known doors
+        self._free = {}          # location -> set of known doors with nothing in them
+        self._configured = {}    # location -> doors from config.LOCATION_DOORS
+        self.loaded = False
+
+        for location, doors in (location_doors or {}).items():
+            for door in doors:
+                key = slot_key(location, door)
+                if key:
+                    self._configured.setdefault(key[0], []).append(key[1])
+                    self.add_door(*key)
+
+    # Known doors
+
+    def add_door(self, location, door):
+        key = slot_key(location, door)
+        if not key:
+            return
+        with self._lock:
+            self._doors.setdefault(key[0], set()).add(key[1])
+            if key not in self._slots and key not in self._reserved:
+                self._free.setdefault(key[0], set()).add(key[1])
+
+    def set_doors(self, location, doors):
+        """Replaces a location's known doors with its configured doors plus doors."""
+        location = str(location or "").strip().upper()
+        if not location:
+            return
+        with self._lock:
+            self._doors.pop(location, None)
+            self._free.pop(location, None)
+            for door in [*self._configured.get(location, []), *doors]:
+                self.add_door(location, door)
+
+    def has_doors(self, location):
+        with self._lock:
+            return bool(self._doors.get(str(location or "").strip().upper()))
+
+    def _mark_taken(self, key):
+        self._free.get(key[0], set()).discard(key[1])
+
+    def _mark_maybe_free(self, key):
+        if key in self._slots or key in self._reserved:
+            return
+        if key[1] in self._doors.get(key[0], ()):
+            self._free.setdefault(key[0], set()).add(key[1])
+
+    # Updates
+
+    def occupy(self, trailer_id, location, door, move_id=None, since=None):
+        """Places a trailer at a door, releasing whatever door it was at before."""
+        key = slot_key(location, door)
+        trailer_id = str(trailer_id or "").strip()
+        if not trailer_id:
+            return
+        with self._lock:
+            self.vacate(trailer_id)
+            if not key:
+                return
+            previous = self._slots.get(key)
+            if previous:
+                self._trailers.pop(previous["trailer_id"], None)
+            self._slots[key] = {"trailer_id": trailer_id, "move_id": move_id, "since": since}
+            self._trailers[trailer_id] = key
+            self._mark_taken(key)
+
+    def vacate(self, trailer_id):
+        with self._lock:
+            key = self._trailers.pop(trailer_id, None)
+            if key and self._slots.get(key, {}).get("trailer_id") == trailer_id:
+                del self._slots[key]
+                self._mark_maybe_free(key)
+
+    def reserve(self, move_id, location, door):
+        key = slot_key(location, door)
+        if not key or not move_id:
+            return
+        with self._lock:
+            self.release(move_id)
+            self._reserved[key] = move_id
+            self._reservations[move_id] = key
+            self._mark_taken(key)
+
+    def try_reserve(self, move_id, location, door, trailer_id=None):
+        """
+        Checks and reserves a destination in one step, so two requests for the
+        same door can't both pass the check before either is written. Returns
+        the conflict (see conflict) and reserves nothing if the door is taken.
+        Callers release the reservation if their write fails.
+        """
+        with self._lock:
+            conflict = self.conflict(location, door, trailer_id=trailer_id, move_id=move_id)
+            if not conflict:
+                self.reserve(move_id, location, door)
+            return conflict
+
+    def release(self, move_id):
+        with self._lock:
+            key = self._reservations.pop(move_id, None)
+            if key and self._reserved.get(key) == move_id:
+                del self._reserved[key]
+                self._mark_maybe_free(key)
+
+    def apply_move(self, move):
+        """Updates the index from a move document in any status."""
+        move_id = move.get("id")
+        status = move.get("status") or "open"
+        with self._lock:
+            if move.get("deleted") is True:
+                self.release(move_id)
+                # A deleted completion no longer puts its trailer at the door
+                trailer_id = str(move.get("trailer_id") or "")
+                if self._slots.get(self._trailers.get(trailer_id), {}).get("move_id") == move_id:
+                    self.vacate(trailer_id)
+            elif status == "completed":
+                self.release(move_id)
+                destination = move_destination(move)
+                since = move.get("completed_at") or move.get("timestamp")
+                current = self._slots.get(self._trailers.get(move.get("trailer_id")), {})
+                # Ignore completions older than what the index already knows
+                if current.get("since") and since and str(since) < str(current["since"]):
+                    return
+                self.occupy(move.get("trailer_id"), *(destination or (None, None)), move_id=move_id, since=since)
+            elif status in ACTIVE_MOVE_STATUSES and move_destination(move):
+                self.reserve(move_id, *move_destination(move))
+            else:
+                self.release(move_id)
+
+    # Queries
+
+    def at_door(self, location, door):
+        key = slot_key(location, door)
+        with self._lock:
+            return {
+                "location": key[0] if key else location,
+                "door": key[1] if key else door,
+                "occupant": self._slots.get(key),
+                "reserved_by": self._reserved.get(key),
+            }
+
+    def free_doors(self, location):
+        """Configured doors at a location with no trailer and no incoming move."""
+        location = str(location or "").strip().upper()
+        with self._lock:
+            return sorted(self._free.get(location, set()), key=lambda d: (len(d), d))
+
+    def trailer_location(self, trailer_id):
+        with self._lock:
+            key = self._trailers.get(str(trailer_id))
+            return {"location": key[0], "door": key[1]} if key else None
+
+    def conflict(self, location, door, trailer_id=None, move_id=None):
+        """
+        Returns a description of what blocks a move to (location, door), or None if
+        the door is free. A trailer does not conflict with itself, and a move does
+        not conflict with its own reservation.
+        """
+        key = slot_key(location, door)
+        if not key:
+            return None
+        with self._lock:
+            occupant = self._slots.get(key)
+            if occupant and occupant["trailer_id"] != str(trailer_id or ""):
+                return f"Door {key[1]} at {key[0]} is occupied by trailer {occupant['trailer_id']}"
+            reserved_by = self._reserved.get(key)
+            if reserved_by and reserved_by != move_id:
+                return f"Door {key[1]} at {key[0]} is the destination of move {reserved_by}"
+        return None
+
+    # Loading
+
+    def load(self, db):
+        """
+        Builds the index with one pass over completed moves. Later changes arrive
+        through apply_move from the active moves listener (see firebase_service).
+        """
+        for doc in db.collection("locations").stream():
+            location = doc.to_dict()
+            if location.get("deleted") is not True:
+                for door in location.get("doors") or []:
+                    self.add_door(location.get("name"), door)
+
+        completed = db.collection("moves").where("status", "==", "completed") \
+            .order_by("completed_at").stream()
+        for doc in completed:
+            self.apply_move({"id": doc.id, **doc.to_dict()})
+
+        self.loaded = True
+        print(f"Occupancy index loaded: {len(self._slots)} occupied doors, {len(self._reserved)} reserved")
+
+    def rebuild(self, db):
+        """Builds a fresh index from the database and swaps it in, so lookups never see a half-built index."""
+        fresh = OccupancyIndex(LOCATION_DOORS)
+        fresh.load(db)
+        # At startup reservations come from the listener's first snapshot, here they are read directly
+        for doc in db.collection("moves").where("status", "in", ACTIVE_MOVE_STATUSES).stream():
+            fresh.apply_move({"id": doc.id, **doc.to_dict()})
+        with self._lock:
+            for name in ("_slots", "_trailers", "_reserved", "_reservations", "_doors", "_free", "_configured"):
+                setattr(self, name, getattr(fresh, name))
+            self.loaded = True
+
+
+occupancy_index = OccupancyIndex(LOCATION_DOORS)
@@ -0,0 +1,108 @@
+"""
+Rate limiting and admission control.
+
+Each user gets a token bucket per route (limits in config.RATE_LIMITS), checked
+when the request's token is validated. Expensive endpoints also have a cap on
+how many requests may run at once (config.CONCURRENCY_LIMITS). Requests over
+either limit are refused immediately with 429/503 and a Retry-After header,
+rather than queueing until they time out.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from fastapi import HTTPException
+from cache import TTLCache
+from config import RATE_LIMITS, CONCURRENCY_LIMITS, CONCURRENCY_RETRY_AFTER_SECONDS
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Takes one token. Returns 0 on success, otherwise seconds until a token is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, limits=RATE_LIMITS):
+        self.limits = limits
+        # Idle buckets are full again after burst / rate seconds, so dropping them is harmless
+        self._buckets = TTLCache(maxsize=50000, ttl=3600)
+        self._lock = threading.Lock()
+
+    def check(self, uid, route):
+        limit = self.limits.get(route, self.limits["default"])
+        key = (uid, route)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(limit["rate"], limit["burst"])
+            retry_after = bucket.take()
+            self._buckets.set(key, bucket)
+
+        if retry_after:
+            print(f"Rate limit exceeded for {uid} on {route}")
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many requests to {route}. Retry in {retry_after:.1f}s.",
+                headers={"Retry-After": str(max(1, round(retry_after)))},
+            )
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limits=CONCURRENCY_LIMITS):
+        self._semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in limits.items()}
+
+    @contextmanager
+    def admit(self, name):
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            yield
+            return
+        if not semaphore.acquire(blocking=False):
+            print(f"Concurrency limit reached for {name}")
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server is busy with other {name} requests. Please retry shortly.",
+                headers={"Retry-After": str(CONCURRENCY_RETRY_AFTER_SECONDS)},
+            )
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+rate_limiter = RateLimiter()
+concurrency_limiter = ConcurrencyLimiter()
+
+
+def limit_concurrency(name):
+    """Endpoint decorator that caps how many requests run the endpoint at once."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with concurrency_limiter.admit(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with concurrency_limiter.admit(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
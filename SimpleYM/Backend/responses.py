@@ -0,0 +1,103 @@
+"""
+Optimized JSON responses for the heavy read endpoints.
+
+Payloads are serialized with orjson (Firestore timestamps, GeoPoints, document
+references and numpy values handled by default()), compressed with brotli or
+gzip when the client accepts it and the body is large enough, and can be
+returned in a compact columnar shape for tabular data.
+"""
+
+import base64
+import gzip
+from datetime import date, datetime
+import orjson
+from fastapi.responses import Response
+from config import COMPRESSION_MIN_BYTES, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def default(value):
+    """Serializes types orjson doesn't handle natively."""
+    # Firestore returns DatetimeWithNanoseconds, a datetime subclass orjson rejects
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "latitude") and hasattr(value, "longitude"):
+        return {"latitude": value.latitude, "longitude": value.longitude}
+    if hasattr(value, "path") and hasattr(value, "id"):
+        # DocumentReference
+        return value.path
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    if hasattr(value, "item"):
+        # numpy / pandas scalars
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=default, option=OPTIONS)
+
+
+def negotiate_encoding(accept_encoding):
+    """Picks br or gzip from an Accept-Encoding header, honoring q-values. Returns None for identity."""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            offered[name] = quality
+
+    candidates = (["br"] if brotli else []) + ["gzip"]
+    best = max(candidates, key=lambda name: offered.get(name, offered.get("*", 0.0)))
+    return best if offered.get(best, offered.get("*", 0.0)) > 0 else None
+
+
+def to_columnar(records):
+    """
+    Converts a list of dicts to {"columns": [...], "rows": [[...], ...]}, so field
+    names are sent once instead of once per record.
+    """
+    columns = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    columns = list(columns)
+    return {"columns": columns, "rows": [[record.get(column) for column in columns] for record in records]}
+
+
+def shape_payload(payload, shape, fields):
+    """Returns payload with the listed record lists converted to columnar when shape == "columnar"."""
+    if shape != "columnar":
+        return payload
+    return {key: to_columnar(value) if key in fields and isinstance(value, list) else value
+            for key, value in payload.items()}
+
+
+def json_response(request, content, status_code=200):
+    """Serializes content with orjson and compresses it if the client accepts it."""
+    body = dumps(content)
+    headers = {"Vary": "Accept-Encoding"}
+
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding == "br":
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
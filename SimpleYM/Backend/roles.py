@@ -0,0 +1,64 @@
+"""
+User roles carried as Firebase custom claims.
+
+Roles are written to the user's custom claims whenever they are set in
+user_master, so they arrive inside every ID token and route checks don't
+need a database read. Users created before claims were introduced fall back
+to their user_master profile (one document, cached) until their claims are
+backfilled.
+"""
+
+from fastapi import HTTPException
+from firebase_admin import auth
+from firebase_service import db
+from cache import TTLCache
+from config import PROFILE_CACHE_SECONDS
+
+profile_cache = TTLCache(maxsize=5000, ttl=PROFILE_CACHE_SECONDS)
+
+# user_master holds the roles that become custom claims, so only admins may write it
+ADMIN_WRITE_COLLECTIONS = {"user_master"}
+
+
+def get_user_profile(uid):
+    """Returns the user_master document for a UID, or None. Served from cache when possible."""
+    profile = profile_cache.get(uid)
+    if profile is None:
+        doc = db.collection("user_master").document(uid).get()
+        profile = doc.to_dict() if doc.exists else {}
+        if profile.get("deleted") is True:
+            profile = {}
+        profile_cache.set(uid, profile)
+    return profile or None
+
+
+def set_role_claim(uid, role):
+    """Writes the role to the user's custom claims, keeping any other claims."""
+    claims = dict(auth.get_user(uid).custom_claims or {})
+    claims["role"] = str(role).lower() if role else None
+    auth.set_custom_user_claims(uid, {key: value for key, value in claims.items() if value is not None})
+    profile_cache.pop(uid)
+    print(f"Role claim for {uid} set to {claims['role']}")
+
+
+def get_role(decoded_token):
+    """Role from the token's custom claims, falling back to the user's profile."""
+    role = decoded_token.get("role")
+    if role:
+        return role
+    profile = get_user_profile(decoded_token.get("uid")) or {}
+    return str(profile.get("role") or "").lower() or None
+
+
+def require_role(decoded_token, *roles):
+    role = get_role(decoded_token)
+    if role not in roles:
+        print(f"User {decoded_token.get('email')} with role {role} denied, requires {roles}")
+        raise HTTPException(status_code=403, detail=f"This action requires role: {', '.join(roles)}")
+    return role
+
+
+def require_write_access(decoded_token, collection):
+    """Raises 403 unless the user may write to the collection."""
+    if collection in ADMIN_WRITE_COLLECTIONS:
+        require_role(decoded_token, "admin")
@@ -0,0 +1,102 @@
+"""
+Delta sync for handheld clients.
+
+Every write path stamps created_at/updated_at in UTC ISO 8601 (change_stamps).
+A sync token encodes the server time of the client's last sync. Changes since
+then are found with one range query per stamped field (see SYNC_COLLECTIONS
+in config.py) and merged by document ID. Deleted documents are tombstones
+(deleted=True, stamped updated_at) and come back from the same queries.
+A client without a token, or whose token is older than the tombstone
+retention period, gets a full snapshot.
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from firebase_service import db, is_tombstone
+from config import SYNC_COLLECTIONS, SYNC_CLOCK_SKEW_SECONDS, ACTIVE_MOVE_STATUSES, TOMBSTONE_RETENTION_DAYS
+
+
+def change_stamps(created=False):
+    """created_at (for new records) and updated_at, the fields sync finds changes by."""
+    now = datetime.utcnow().isoformat()
+    return {"created_at": now, "updated_at": now} if created else {"updated_at": now}
+
+
+def encode_token(server_time):
+    payload = json.dumps({"t": server_time.isoformat()}).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_token(token):
+    """Returns the sync time stored in a token. Raises ValueError for malformed tokens."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        return datetime.fromisoformat(json.loads(base64.urlsafe_b64decode(padded))["t"])
+    except Exception:
+        raise ValueError("Invalid sync token")
+
+
+def snapshot(collection):
+    """Full contents of a collection for a first sync. Moves are limited to active ones."""
+    query = db.collection(collection)
+    if collection == "moves":
+        query = query.where("status", "in", ACTIVE_MOVE_STATUSES)
+    docs = ({"id": doc.id, **doc.to_dict()} for doc in query.stream())
+    return [doc for doc in docs if not is_tombstone(doc)]
+
+
+def changes_since(collection, since):
+    """
+    Documents in a collection stamped after since, split into created, updated
+    and deleted (IDs of tombstones). The first configured field is the creation stamp.
+    """
+    fields = SYNC_COLLECTIONS[collection]
+    changed = {}
+    for field in fields:
+        for doc in db.collection(collection).where(field, ">", since).stream():
+            changed[doc.id] = {"id": doc.id, **doc.to_dict()}
+
+    live = [doc for doc in changed.values() if not is_tombstone(doc)]
+    created = [doc for doc in live if str(doc.get(fields[0]) or "") > since]
+    updated = [doc for doc in live if str(doc.get(fields[0]) or "") <= since]
+    deleted = [doc["id"] for doc in changed.values() if is_tombstone(doc)]
+    return created, updated, deleted
+
+
+def collect_changes(token, collections):
+    """
+    Returns (new_token, changes, full) where changes maps each collection to its
+    created, updated and deleted documents since the token, and full is true
+    when a snapshot was sent instead. Collections are queried in parallel.
+    """
+    now = datetime.utcnow()
+    new_token = encode_token(now)
+
+    # Tombstones older than the retention period may be purged already
+    if token and decode_token(token) < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        token = None
+
+    if not token:
+        with ThreadPoolExecutor(max_workers=len(collections) or 1) as executor:
+            docs = dict(zip(collections, executor.map(snapshot, collections)))
+        return new_token, {
+            collection: {"created": docs[collection], "updated": [], "deleted": []}
+            for collection in collections
+        }, True
+
+    # Re-send a small overlap so writes racing the previous sync aren't missed
+    since = (decode_token(token) - timedelta(seconds=SYNC_CLOCK_SKEW_SECONDS)).isoformat()
+
+    with ThreadPoolExecutor(max_workers=len(collections) or 1) as executor:
+        results = dict(zip(collections, executor.map(lambda c: changes_since(c, since), collections)))
+
+    return new_token, {
+        collection: {
+            "created": results[collection][0],
+            "updated": results[collection][1],
+            "deleted": results[collection][2],
+        }
+        for collection in collections
+    }, False
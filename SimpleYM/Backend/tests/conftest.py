@@ -0,0 +1,214 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# The backend is a flat set of modules run from its own directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class NotFound(Exception):
+    pass
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, docs, doc_id):
+        self._docs = docs
+        self.id = doc_id
+
+    def get(self, transaction=None):
+        data = self._docs.get(self.id)
+        return FakeSnapshot(self, dict(data) if data is not None else None)
+
+    def set(self, data):
+        self._docs[self.id] = dict(data)
+
+    def create(self, data):
+        if self.id in self._docs:
+            from google.api_core.exceptions import AlreadyExists as Exists
+            raise Exists(f"{self.id} already exists")
+        self.set(data)
+
+    def update(self, fields):
+        if self.id not in self._docs:
+            raise NotFound(self.id)
+        self._docs[self.id].update(fields)
+
+    def delete(self):
+        self._docs.pop(self.id, None)
+
+
+OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "in": lambda a, b: a in b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+}
+
+
+class FakeQuery:
+    """
+    Enough of a Firestore query for the backend: where, order_by, limit,
+    start_after, select and stream. Ordering ties break on document ID, and
+    documents missing the ordered field are left out, as in Firestore.
+    """
+
+    def __init__(self, docs, filters=(), order=None, limit=None, after=None):
+        self._docs = docs
+        self._filters = list(filters)
+        self._order = order
+        self._limit = limit
+        self._after = after
+
+    def _copy(self, **changes):
+        state = {"filters": self._filters, "order": self._order, "limit": self._limit, "after": self._after}
+        state.update(changes)
+        return FakeQuery(self._docs, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=[*self._filters, (field, op, value)])
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(order=(field, direction))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot)
+
+    def select(self, fields):
+        return self
+
+    def stream(self):
+        docs = [FakeSnapshot(FakeDocument(self._docs, doc_id), dict(data))
+                for doc_id, data in list(self._docs.items())
+                if all(OPERATORS[op](data.get(field), value) for field, op, value in self._filters)]
+        if self._order:
+            field, direction = self._order
+            docs = [doc for doc in docs if doc.to_dict().get(field) is not None]
+            docs.sort(key=lambda doc: (doc.to_dict()[field], doc.id), reverse=direction == "DESCENDING")
+        if self._after is not None:
+            ids = [doc.id for doc in docs]
+            docs = docs[ids.index(self._after.id) + 1:] if self._after.id in ids else docs
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return iter(docs)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, docs):
+        super().__init__(docs)
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._docs, doc_id or uuid.uuid4().hex[:20])
+
+
+class FakeBatch:
+    def __init__(self):
+        self._writes = []
+
+    def set(self, ref, data):
+        self._writes.append(lambda: ref.set(data))
+
+    def update(self, ref, fields):
+        self._writes.append(lambda: ref.update(fields))
+
+    def delete(self, ref):
+        self._writes.append(ref.delete)
+
+    def commit(self):
+        for write in self._writes:
+            write()
+
+
+class FakeFirestore:
+    """In-memory stand-in for the Firestore client: {collection: {doc_id: data}}."""
+
+    def __init__(self, collections=None):
+        self.collections = collections or {}
+
+    def collection(self, name):
+        return FakeCollection(self.collections.setdefault(name, {}))
+
+    def batch(self):
+        return FakeBatch()
+
+
+@pytest.fixture
+def fake_db():
+    return FakeFirestore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.time(); advance with clock.advance(seconds)."""
+    class Clock:
+        now = 1_000_000.0
+
+        def advance(self, seconds):
+            self.now += seconds
+
+    fake = Clock()
+    monkeypatch.setattr("time.time", lambda: fake.now)
+    return fake
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """
+    A TestClient for main.app backed by an in-memory Firestore and fresh
+    occupancy and queue indexes. Tokens are "uid" or "uid:role".
+    """
+    pytest.importorskip("firebase_admin")
+    from fastapi.testclient import TestClient
+
+    import firebase_service
+    import main
+    import roles
+    from move_queue import MoveQueue
+    from occupancy import OccupancyIndex
+
+    db = FakeFirestore()
+    monkeypatch.setattr(firebase_service, "_client", db)
+    monkeypatch.setattr(main, "occupancy_index", OccupancyIndex())
+    monkeypatch.setattr(main, "move_queue", MoveQueue())
+
+    def verify_id_token(token):
+        uid, _, role = token.partition(":")
+        return {"uid": uid, "email": f"{uid}@example.com", **({"role": role} if role else {})}
+
+    monkeypatch.setattr(main.auth, "verify_id_token", verify_id_token)
+    roles.profile_cache.clear()
+
+    class Api:
+        def __init__(self):
+            self.client = TestClient(main.app)
+            self.db = db
+            self.main = main
+
+        def request(self, method, path, token="driver1", **kwargs):
+            return self.client.request(method, path, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+
+        def post(self, path, token="driver1", **kwargs):
+            return self.request("POST", path, token, **kwargs)
+
+        def get(self, path, token="driver1", **kwargs):
+            return self.request("GET", path, token, **kwargs)
+
+    return Api()
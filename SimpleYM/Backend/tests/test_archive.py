@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+
+def days_ago(days):
+    return (datetime.utcnow() - timedelta(days=days)).isoformat()
+
+
+def completed(trailer_id, days, **fields):
+    return {"trailer_id": trailer_id, "status": "completed", "to_location": "FRZ", "to_door": "5",
+            "completed_at": days_ago(days), **fields}
+
+
+@pytest.fixture
+def history(api, monkeypatch, tmp_path):
+    import archive
+
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    api.db.collections["moves"] = {
+        "a200": completed("T1", 200),
+        "a150": completed("T1", 150),
+        "a100": completed("T1", 100),
+        "a10": completed("T1", 10),
+        "b200": completed("T2", 200),
+        "gone": completed("T1", 300, deleted=True),
+        "open": {"trailer_id": "T1", "status": "open", "created_at": days_ago(400)},
+    }
+    return archive
+
+
+def pages(archive, filters, limit):
+    ids, cursor = [], None
+    while True:
+        moves, cursor = archive.query_move_history_tiers(filters, limit=limit, cursor=cursor)
+        ids.append([move["id"] for move in moves])
+        if not cursor:
+            return ids
+
+
+def test_archive_moves_old_completed_moves_out_of_firestore(api, history):
+    assert history.archive_collection("moves", after_days=90) == 3
+    # Latest move per trailer, tombstones and open moves stay in Firestore
+    assert set(api.db.collections["moves"]) == {"a10", "b200", "gone", "open"}
+
+    rows = history.query_archive("moves", {"trailer_id": "T1"})
+    assert [row["id"] for row in rows] == ["a100", "a150", "a200"]
+    assert history.to_records(rows[:1])[0]["to_location"] == "FRZ"
+
+    months = {month for month, _ in history.partition_files("moves")}
+    assert months == {value[:7] for value in (days_ago(100), days_ago(150), days_ago(200))}
+    assert [row["id"] for row in history.query_archive("moves", start=days_ago(120))] == ["a100"]
+
+
+def test_history_pages_merge_both_tiers_newest_first(api, history):
+    history.archive_collection("moves", after_days=90)
+    expected = ["a10", "a100", "a150", "a200"]
+    for limit in (1, 2, 3, 10):
+        result = pages(history, {"trailer_id": "T1"}, limit)
+        assert [move_id for page in result for move_id in page] == expected, limit
+        assert all(len(page) <= limit for page in result)
+
+    # b200 was stamped just after a200, so it is the newer of the two
+    everything = [move_id for page in pages(history, {}, 2) for move_id in page]
+    assert everything == ["a10", "a100", "a150", "b200", "a200"]
+
+
+def test_moves_in_both_tiers_are_returned_once(api, history):
+    a100 = dict(api.db.collections["moves"]["a100"])
+    history.archive_collection("moves", after_days=90)
+    # An archive run interrupted between writing Parquet and deleting from Firestore
+    api.db.collections["moves"]["a100"] = a100
+    for limit in (1, 2, 5):
+        result = [move_id for page in pages(history, {"trailer_id": "T1"}, limit) for move_id in page]
+        assert result == ["a10", "a100", "a150", "a200"], limit
+
+
+def test_history_time_range_and_bad_input(api, history):
+    history.archive_collection("moves", after_days=90)
+    moves, cursor = history.query_move_history_tiers({"trailer_id": "T1"}, start=days_ago(160), end=days_ago(50))
+    assert [move["id"] for move in moves] == ["a100", "a150"] and cursor is None
+
+    with pytest.raises(ValueError):
+        history.decode_history_cursor("not a cursor")
+    with pytest.raises(ValueError):
+        history.query_archive("moves", {"from_door": "3"})
+
+    assert api.get("/move-history", params={"cursor": "bogus"}).status_code == 400
+    response = api.get("/move-history", params={"trailer_id": "T1", "limit": 3})
+    body = response.json()
+    assert [move["id"] for move in body["moves"]] == ["a10", "a100", "a150"]
+    assert body["next_cursor"]
@@ -0,0 +1,55 @@
+from idempotency import IN_PROGRESS, MISMATCH, NEW, REPLAY, IdempotencyStore, fingerprint
+
+
+def multipart(boundary, contents=b"DATA"):
+    return (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"collection\"\r\n\r\nmoves\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"moves.xlsx\"\r\n\r\n"
+    ).encode() + contents + f"\r\n--{boundary}--\r\n".encode()
+
+
+def test_first_request_runs_and_retries_replay():
+    store = IdempotencyStore()
+    scope = ("uid", "POST", "/add-record", "key-1")
+
+    assert store.begin(scope, "fp") == (NEW, None)
+    assert store.begin(scope, "fp") == (IN_PROGRESS, None)
+    assert store.begin(scope, "other") == (MISMATCH, None)
+
+    store.finish(scope, "fp", 200, {"content-type": "application/json"}, b"{}")
+    state, cached = store.begin(scope, "fp")
+    assert state == REPLAY
+    assert (cached["status_code"], cached["body"]) == (200, b"{}")
+    assert store.begin(scope, "other") == (MISMATCH, None)
+
+
+def test_failed_and_timing_dependent_responses_are_not_kept():
+    store = IdempotencyStore()
+    for status_code in (500, 429, 409):
+        scope = ("uid", "POST", "/add-record", f"key-{status_code}")
+        store.begin(scope, "fp")
+        store.finish(scope, "fp", status_code, {}, b"")
+        assert store.begin(scope, "fp") == (NEW, None)
+
+
+def test_abandoned_request_can_be_retried():
+    store = IdempotencyStore()
+    scope = ("uid", "POST", "/add-record", "key")
+    store.begin(scope, "fp")
+    store.abandon(scope)
+    assert store.begin(scope, "fp") == (NEW, None)
+
+
+def test_keys_are_scoped_per_user():
+    store = IdempotencyStore()
+    store.begin(("a", "POST", "/add-record", "key"), "fp")
+    assert store.begin(("b", "POST", "/add-record", "key"), "fp") == (NEW, None)
+
+
+def test_fingerprint_ignores_the_multipart_boundary():
+    first = fingerprint("", multipart("boundary1"), "multipart/form-data; boundary=boundary1")
+    retry = fingerprint("", multipart("----axios42"), "multipart/form-data; boundary=----axios42")
+    other_file = fingerprint("", multipart("b", b"OTHER"), "multipart/form-data; boundary=b")
+    assert first == retry
+    assert first != other_file
+    assert fingerprint("a=1", b"{}") != fingerprint("a=2", b"{}")
@@ -0,0 +1,183 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from jobs import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobFailed, JobRunner, job_type
+
+processed = []
+started = threading.Event()
+
+
+@job_type("test_noop")
+def noop_job(ctx):
+    return {"ok": True}
+
+
+@job_type("test_count")
+def count_job(ctx, to):
+    for number in range(ctx.checkpoint.get("done", 0), to):
+        processed.append(number)
+        ctx.progress(number + 1, to, checkpoint={"done": number + 1})
+    return {"done": to}
+
+
+@job_type("test_wait")
+def wait_job(ctx):
+    started.set()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        ctx.check_cancelled()
+        time.sleep(0.01)
+
+
+@job_type("test_invalid")
+def invalid_job(ctx):
+    raise JobFailed("2 validation error(s)", result={"error_count": 2, "errors": [{"row": 3}]})
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def make_runner(tmp_path):
+    runners = []
+
+    def make():
+        runner = JobRunner(directory=str(tmp_path), max_workers=2)
+        runner.start()
+        runners.append(runner)
+        return runner
+
+    yield make
+    for runner in runners:
+        runner.shutdown()
+
+
+def finished(runner, type_name):
+    return [job for job in runner.list() if job["type"] == type_name and job["status"] == SUCCEEDED]
+
+
+def test_schedule_runs_an_overdue_job_at_start(make_runner):
+    runner = make_runner()
+    runner.schedule("test_noop", 3600)
+    assert wait_for(lambda: finished(runner, "test_noop"))
+
+
+def test_schedule_waits_for_the_interval_across_restarts(make_runner):
+    first = make_runner()
+    first.schedule("test_noop", 3600)
+    assert wait_for(lambda: finished(first, "test_noop"))
+    first.shutdown()
+
+    # Restarted within the interval: the last run is remembered
+    second = make_runner()
+    second.schedule("test_noop", 3600)
+    time.sleep(0.2)
+    assert len(second.list()) == 1
+
+    # Restarted after the interval: the job is overdue and runs right away
+    second.shutdown()
+    two_hours_ago = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+    third = make_runner()
+    job_id = third.list()[0]["id"]
+    third._update(job_id, finished_at=two_hours_ago)
+    third.schedule("test_noop", 3600)
+    assert wait_for(lambda: len(finished(third, "test_noop")) == 2)
+
+
+def status(runner, job_id):
+    return runner.get(job_id)["status"]
+
+
+def test_unfinished_jobs_resume_from_their_checkpoint(make_runner):
+    first = make_runner()
+    # A job the previous process was running when it stopped
+    with first._lock:
+        first._conn.execute(
+            "INSERT INTO jobs (id, type, params, status, checkpoint, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            ("j1", "test_count", json.dumps({"to": 5}), RUNNING, json.dumps({"done": 3}), datetime.utcnow().isoformat()),
+        )
+        first._conn.commit()
+    first.shutdown()
+
+    processed.clear()
+    second = make_runner()
+    assert wait_for(lambda: status(second, "j1") == SUCCEEDED)
+    assert processed == [3, 4]
+    assert second.get("j1")["result"] == {"done": 5}
+
+
+def test_cancel_queued_and_running_jobs(tmp_path):
+    runner = JobRunner(directory=str(tmp_path), max_workers=1)
+    runner.start()
+    try:
+        started.clear()
+        running = runner.submit("test_wait")
+        assert started.wait(5)
+        queued = runner.submit("test_noop")
+        assert status(runner, queued["id"]) == QUEUED
+
+        assert runner.cancel(queued["id"])["status"] == CANCELLED
+        runner.cancel(running["id"])
+        assert wait_for(lambda: status(runner, running["id"]) == CANCELLED)
+        # The cancelled queued job never runs
+        time.sleep(0.1)
+        assert status(runner, queued["id"]) == CANCELLED
+        assert runner.get(queued["id"])["started_at"] is None
+    finally:
+        runner.shutdown()
+
+
+def test_failed_jobs_keep_their_result(make_runner):
+    runner = make_runner()
+    job = runner.submit("test_invalid")
+    assert wait_for(lambda: status(runner, job["id"]) == FAILED)
+    failed = runner.get(job["id"])
+    assert failed["error"] == "2 validation error(s)"
+    assert failed["result"] == {"error_count": 2, "errors": [{"row": 3}]}
+
+
+class Context:
+    job_id = "0123456789abcdef"
+    checkpoint = {}
+
+    def progress(self, done, total=None, message=None, checkpoint=None):
+        pass
+
+    def check_cancelled(self):
+        pass
+
+
+def spreadsheet(tmp_path, rows):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "upload.xlsx"
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return str(path)
+
+
+def test_import_excel_reports_validation_errors_in_the_job(api, tmp_path):
+    path = spreadsheet(tmp_path, {"id": ["100001", None], "year": [2019, "old"]})
+    with pytest.raises(JobFailed) as failure:
+        api.main.import_excel_job(Context(), "trailer_master", path)
+    assert failure.value.result["error_count"] == 2
+    assert {(error["row"], error["field"]) for error in failure.value.result["errors"]} == {(3, "id"), (3, "year")}
+    assert not api.db.collections.get("trailer_master")
+
+
+def test_import_excel_writes_coerced_rows(api, tmp_path):
+    path = spreadsheet(tmp_path, {"id": [100001, 100002], "year": [2019, None], "reefer": ["yes", "no"]})
+    result = api.main.import_excel_job(Context(), "trailer_master", path)
+    assert result["records"] == 2
+    stored = {record["id"]: record for record in api.db.collections["trailer_master"].values()}
+    assert stored["100001"]["year"] == 2019 and stored["100001"]["reefer"] is True
+    assert stored["100002"]["year"] is None
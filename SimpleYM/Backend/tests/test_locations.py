@@ -0,0 +1,16 @@
+def test_location_writes_refresh_the_cached_list(api):
+    api.main.locations_cache.clear()
+    api.db.collections["locations"] = {"L1": {"id": "L1", "name": "CLR"}}
+    assert api.get("/locations").json()["locations"] == ["CLR"]
+
+    response = api.post("/add-record", json={"collection": "locations", "data": [{"id": "L2", "name": "FRZ"}]})
+    assert response.status_code == 200
+    assert api.get("/locations").json()["locations"] == ["CLR", "FRZ"]
+
+    response = api.request("PUT", "/update", params={"collection": "locations", "id": "L1"}, json={"name": "DRY"})
+    assert response.status_code == 200
+    assert api.get("/locations").json()["locations"] == ["DRY", "FRZ"]
+
+    response = api.request("PUT", "/update-record", json={"collection": "locations", "data": [{"id": "L2", "name": "ICE"}]})
+    assert response.status_code == 200
+    assert api.get("/locations").json()["locations"] == ["DRY", "ICE"]
@@ -0,0 +1,187 @@
+import pytest
+
+from move_queue import MoveQueue, parse_move_time
+
+
+def open_move(move_id, created, **fields):
+    return {"id": move_id, "status": "open", "created_at": created, "trailer_id": f"T{move_id}", **fields}
+
+
+def test_parse_move_time_formats():
+    assert parse_move_time("2026-01-01T12:00:00Z") == parse_move_time("2026-01-01T12:00:00+00:00")
+    # Notify Ready's /current-time format, EST in 12-hour time
+    assert parse_move_time("2026-01-01 07:00:00 AM EST") == parse_move_time("2026-01-01T12:00:00Z")
+    assert parse_move_time("not a time") is None
+    assert parse_move_time(None) is None
+
+
+def test_claim_serves_oldest_first_with_urgency_bonuses(clock):
+    queue = MoveQueue()
+    queue.reefer_trailers = {"TR"}
+    queue.push(open_move("old", "2026-01-01T10:00:00"))
+    queue.push(open_move("new", "2026-01-01T10:30:00"))
+    queue.push(open_move("urgent", "2026-01-01T10:45:00", priority="urgent"))
+    queue.push(open_move("reefer", "2026-01-01T10:10:00", trailer_id="TR"))
+
+    order = [queue.claim(f"driver{i}")["move"]["id"] for i in range(4)]
+    assert order == ["urgent", "reefer", "old", "new"]
+    assert queue.claim("driver5") is None
+
+
+def test_retried_claim_returns_the_same_lease(clock):
+    queue = MoveQueue()
+    queue.push(open_move("a", "2026-01-01T10:00:00"))
+    queue.push(open_move("b", "2026-01-01T11:00:00"))
+
+    first = queue.claim("driver")
+    assert queue.claim("driver") == first
+    assert queue.lease_of("driver") == first
+    assert queue.claim("other")["move"]["id"] == "b"
+
+
+def test_expired_lease_goes_back_in_the_queue(clock):
+    queue = MoveQueue(lease_seconds=60)
+    queue.push(open_move("a", "2026-01-01T10:00:00"))
+
+    assert queue.claim("driver1")["move"]["id"] == "a"
+    assert queue.claim("driver2") is None
+
+    clock.advance(61)
+    assert queue.lease_for("a", "driver1") is None
+    assert queue.lease_of("driver1") is None
+    lease = queue.claim("driver2")
+    assert lease["move"]["id"] == "a"
+    assert lease["lease_expires_at"] == clock.now + 60
+
+
+def test_release_requires_the_lease_holder(clock):
+    queue = MoveQueue()
+    queue.push(open_move("a", "2026-01-01T10:00:00"))
+    queue.claim("driver1")
+
+    assert queue.release("a", "driver2") is False
+    assert queue.release("a", "driver1") is True
+    assert queue.claim("driver2")["move"]["id"] == "a"
+
+
+def test_released_move_is_not_offered_back_to_the_same_driver(clock):
+    queue = MoveQueue(skip_seconds=600)
+    queue.push(open_move("a", "2026-01-01T10:00:00"))
+    queue.push(open_move("b", "2026-01-01T11:00:00"))
+
+    assert queue.claim("driver1")["move"]["id"] == "a"
+    queue.release("a", "driver1")
+    assert queue.claim("driver1")["move"]["id"] == "b"
+    queue.release("b", "driver1")
+    assert queue.claim("driver1") is None
+
+    # Other drivers still get the skipped moves, in order
+    assert queue.claim("driver2")["move"]["id"] == "a"
+    queue.apply_move({**open_move("a", "2026-01-01T10:00:00"), "status": "picked up"})
+
+    clock.advance(601)
+    assert queue.claim("driver1")["move"]["id"] == "b"
+
+
+def test_stale_heap_entries_are_skipped(clock):
+    queue = MoveQueue()
+    move = open_move("a", "2026-01-01T10:00:00")
+    queue.push(move)
+    queue.push({**move, "priority": "urgent"})  # re-push leaves the old heap entry behind
+    queue.push(open_move("b", "2026-01-01T11:00:00"))
+    queue.discard("b")
+
+    assert queue.claim("driver1")["move"]["priority"] == "urgent"
+    assert queue.claim("driver2") is None
+    assert queue.stats()["queued"] == 0
+
+
+def test_apply_move_tracks_status_and_tombstones(clock):
+    queue = MoveQueue()
+    queue.apply_move(open_move("a", "2026-01-01T10:00:00"))
+    queue.apply_move({"id": "legacy", "trailer_id": "T1"})  # no status counts as open
+    queue.apply_move({**open_move("b", "2026-01-01T10:00:00"), "deleted": True})
+    assert queue.stats()["queued"] == 2
+
+    queue.claim("driver")
+    queue.apply_move({"id": "a", "status": "picked up"})
+    queue.apply_move({"id": "legacy", "status": "completed"})
+    stats = queue.stats()
+    assert (stats["queued"], stats["leased"]) == (0, 0)
+
+
+def test_load_from_firestore(fake_db, clock):
+    db = fake_db({
+        "trailer_master": {
+            "r1": {"id": "R1", "reefer": True},
+            "r2": {"id": "R2", "reefer": True, "deleted": True},
+            "d1": {"id": "D1", "reefer": False},
+        },
+        "moves": {
+            "m1": {"status": "open", "trailer_id": "D1", "created_at": "2026-01-01T10:00:00"},
+            "m2": {"status": "open", "trailer_id": "R1", "created_at": "2026-01-01T10:05:00"},
+            "m3": {"status": "open", "trailer_id": "D1", "deleted": True},
+            "m4": {"status": "completed", "trailer_id": "D1"},
+        },
+    })
+    queue = MoveQueue()
+    queue.load(db)
+
+    assert queue.loaded
+    assert queue.reefer_trailers == {"R1"}
+    assert queue.claim("driver1")["move"]["id"] == "m2"
+    assert queue.claim("driver2")["move"]["id"] == "m1"
+    assert queue.claim("driver3") is None
+
+
+@pytest.fixture
+def moves_api(api, monkeypatch):
+    """api with two open moves queued and transition_move applied without a Firestore transaction."""
+    def transition_move(transaction, move_ref, expected_status, updates):
+        snapshot = move_ref.get()
+        if (snapshot.to_dict().get("status") or "open") != expected_status:
+            from fastapi import HTTPException
+            raise HTTPException(status_code=409, detail="wrong status")
+        move_ref.update(updates)
+        return {"id": snapshot.id, **move_ref.get().to_dict()}
+
+    monkeypatch.setattr(api.main, "transition_move", transition_move)
+    monkeypatch.setattr(api.db, "transaction", lambda: None, raising=False)
+    api.db.collections["moves"] = {
+        "a": open_move("a", "2026-01-01T10:00:00"),
+        "b": open_move("b", "2026-01-01T11:00:00"),
+    }
+    for move_id, move in api.db.collections["moves"].items():
+        api.main.move_queue.push({"id": move_id, **move})
+    return api
+
+
+def test_skip_moves_on_to_the_next_move(moves_api):
+    assert moves_api.post("/moves/claim").json()["move"]["id"] == "a"
+    assert moves_api.post("/moves/a/release").status_code == 200
+    assert moves_api.post("/moves/claim").json()["move"]["id"] == "b"
+    assert moves_api.post("/moves/claim", token="driver2").json()["move"]["id"] == "a"
+
+
+def test_only_the_driver_who_picked_up_a_move_completes_it(moves_api):
+    moves_api.post("/moves/claim")
+    assert moves_api.post("/moves/a/ack").status_code == 200
+    destination = {"to_location": "FRZ", "to_door": "5"}
+
+    assert moves_api.post("/moves/a/complete", token="driver2", json=destination).status_code == 403
+    assert moves_api.db.collections["moves"]["a"]["status"] == "picked up"
+    assert moves_api.main.occupancy_index.at_door("FRZ", "5")["reserved_by"] is None
+
+    response = moves_api.post("/moves/a/complete", json=destination)
+    assert response.status_code == 200
+    stored = moves_api.db.collections["moves"]["a"]
+    assert (stored["status"], stored["user_id"]) == ("completed", "driver1")
+    assert moves_api.main.occupancy_index.trailer_location(stored["trailer_id"]) == {"location": "FRZ", "door": "5"}
+
+
+def test_admins_can_complete_any_move(moves_api):
+    moves_api.post("/moves/claim")
+    moves_api.post("/moves/a/ack")
+    response = moves_api.post("/moves/a/complete", token="boss:admin", json={"to_location": "FRZ", "to_door": "5"})
+    assert response.status_code == 200
+    assert moves_api.db.collections["moves"]["a"]["user_id"] == "driver1"
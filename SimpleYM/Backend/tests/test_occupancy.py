@@ -0,0 +1,194 @@
+from occupancy import OccupancyIndex, move_destination, slot_key
+
+
+def test_slot_key_normalizes():
+    assert slot_key(" frz ", " 12 ") == ("FRZ", "12")
+    assert slot_key("FRZ", "") is None
+    assert move_destination({"to_wh_yard": "clr", "to_door": "3"}) == ("CLR", "3")
+    assert move_destination({"to_location": "DRY FRONT", "to_wh_yard": "clr", "to_door": "3"}) == ("DRY FRONT", "3")
+
+
+def test_occupy_and_vacate_update_free_doors():
+    index = OccupancyIndex({"FRZ": ["1", "2"]})
+    assert index.free_doors("frz") == ["1", "2"]
+
+    index.occupy("T1", "FRZ", "1", move_id="m1")
+    assert index.free_doors("FRZ") == ["2"]
+    assert index.trailer_location("T1") == {"location": "FRZ", "door": "1"}
+    assert index.at_door("FRZ", "1")["occupant"]["trailer_id"] == "T1"
+
+    # Moving the trailer frees its old door
+    index.occupy("T1", "FRZ", "2", move_id="m2")
+    assert index.free_doors("FRZ") == ["1"]
+
+    index.vacate("T1")
+    assert index.free_doors("FRZ") == ["1", "2"]
+    assert index.trailer_location("T1") is None
+
+
+def test_only_configured_doors_are_listed():
+    index = OccupancyIndex({"FRZ": ["1"]})
+    index.occupy("T1", "CLR", "7")
+    index.vacate("T1")
+    assert not index.has_doors("CLR")
+    assert index.free_doors("CLR") == []
+
+    index.set_doors("clr", ["7", "8"])
+    index.set_doors("FRZ", ["2"])  # configured doors are kept
+    assert index.free_doors("CLR") == ["7", "8"]
+    assert index.free_doors("FRZ") == ["1", "2"]
+
+    index.occupy("T2", "CLR", "8")
+    index.set_doors("CLR", ["7", "8", "9"])
+    assert index.free_doors("CLR") == ["7", "9"]
+
+
+def test_reserve_and_release():
+    index = OccupancyIndex({"CLR": ["5"]})
+    index.reserve("m1", "CLR", "5")
+    assert index.free_doors("CLR") == []
+    assert index.conflict("CLR", "5", move_id="m1") is None
+    assert "destination of move m1" in index.conflict("CLR", "5", move_id="m2")
+
+    index.release("m1")
+    assert index.free_doors("CLR") == ["5"]
+    assert index.conflict("CLR", "5", move_id="m2") is None
+
+
+def test_try_reserve_lets_only_one_move_claim_a_door():
+    index = OccupancyIndex({"FRZ": ["5"]})
+    assert index.try_reserve("m1", "FRZ", "5") is None
+    assert "destination of move m1" in index.try_reserve("m2", "frz", "5")
+    assert index.try_reserve("m1", "FRZ", "5") is None  # a move doesn't conflict with itself
+    assert index.free_doors("FRZ") == []
+
+    index.release("m1")
+    assert index.try_reserve("m2", "FRZ", "5") is None
+
+
+def test_try_reserve_is_atomic_across_threads():
+    import threading
+
+    index = OccupancyIndex()
+    results = []
+    barrier = threading.Barrier(20)
+
+    def reserve(move_id):
+        barrier.wait()
+        results.append(index.try_reserve(move_id, "FRZ", "5"))
+
+    threads = [threading.Thread(target=reserve, args=(f"m{i}",)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(None) == 1
+
+
+def test_conflict_ignores_the_trailer_itself():
+    index = OccupancyIndex()
+    index.occupy("T1", "FRZ", "1")
+    assert index.conflict("FRZ", "1", trailer_id="T1") is None
+    assert "occupied by trailer T1" in index.conflict("FRZ", "1", trailer_id="T2")
+    assert index.conflict("FRZ", "", trailer_id="T2") is None
+
+
+def test_apply_move_lifecycle():
+    index = OccupancyIndex({"FRZ": ["1"]})
+    move = {"id": "m1", "trailer_id": "T1", "to_location": "FRZ", "to_door": "1"}
+
+    index.apply_move({**move, "status": "open"})
+    assert index.at_door("FRZ", "1")["reserved_by"] == "m1"
+
+    index.apply_move({**move, "status": "completed", "completed_at": "2026-01-02T00:00:00"})
+    door = index.at_door("FRZ", "1")
+    assert door["reserved_by"] is None
+    assert door["occupant"]["move_id"] == "m1"
+
+    # A completion older than what the index knows is ignored
+    index.apply_move({"id": "m0", "trailer_id": "T1", "status": "completed", "to_location": "CLR",
+                      "to_door": "9", "completed_at": "2026-01-01T00:00:00"})
+    assert index.trailer_location("T1") == {"location": "FRZ", "door": "1"}
+
+
+def test_deleted_completed_move_frees_its_door():
+    index = OccupancyIndex({"FRZ": ["1"]})
+    move = {"id": "m1", "trailer_id": "T1", "status": "completed", "to_location": "FRZ", "to_door": "1",
+            "completed_at": "2026-01-02T00:00:00"}
+    index.apply_move(move)
+    index.apply_move({**move, "deleted": True})
+    assert index.trailer_location("T1") is None
+    assert index.free_doors("FRZ") == ["1"]
+
+
+def test_deleting_an_older_move_keeps_the_current_door():
+    index = OccupancyIndex()
+    index.apply_move({"id": "m1", "trailer_id": "T1", "status": "completed", "to_location": "FRZ",
+                      "to_door": "1", "completed_at": "2026-01-01T00:00:00"})
+    index.apply_move({"id": "m2", "trailer_id": "T1", "status": "completed", "to_location": "CLR",
+                      "to_door": "2", "completed_at": "2026-01-02T00:00:00"})
+    index.apply_move({"id": "m1", "trailer_id": "T1", "status": "completed", "deleted": True})
+    assert index.trailer_location("T1") == {"location": "CLR", "door": "2"}
+
+
+def test_load_and_rebuild_from_firestore(fake_db):
+    db = fake_db({
+        "locations": {"FRZ": {"name": "FRZ", "doors": ["1", "2", "3"]}},
+        "moves": {
+            "m1": {"trailer_id": "T1", "status": "completed", "to_location": "FRZ", "to_door": "1",
+                   "completed_at": "2026-01-01T00:00:00"},
+            "m2": {"trailer_id": "T1", "status": "completed", "to_location": "FRZ", "to_door": "2",
+                   "completed_at": "2026-01-02T00:00:00"},
+            "m3": {"trailer_id": "T2", "status": "open", "to_wh_yard": "FRZ", "to_door": "3"},
+        },
+    })
+    index = OccupancyIndex()
+    index.rebuild(db)
+
+    assert index.loaded
+    assert index.trailer_location("T1") == {"location": "FRZ", "door": "2"}
+    assert index.at_door("FRZ", "3")["reserved_by"] == "m3"
+    assert index.free_doors("FRZ") == ["1"]
+
+
+def test_add_record_rejects_two_moves_to_the_same_door(api):
+    moves = [
+        {"trailer_id": "T1", "to_wh_yard": "FRZ", "to_door": "5", "status": "open"},
+        {"trailer_id": "T2", "to_wh_yard": "FRZ", "to_door": "5", "status": "open"},
+    ]
+    response = api.post("/add-record", json={"collection": "moves", "data": moves})
+    assert response.status_code == 409
+    assert api.db.collections.get("moves", {}) == {}
+    # Nothing from the rejected batch stays reserved
+    assert api.main.occupancy_index.at_door("FRZ", "5")["reserved_by"] is None
+
+    assert api.post("/add-record", json={"collection": "moves", "data": moves[:1]}).status_code == 200
+    assert api.post("/add-record", json={"collection": "moves", "data": moves[1:]}).status_code == 409
+    assert len(api.db.collections["moves"]) == 1
+
+
+def test_failed_write_releases_the_door(api, monkeypatch):
+    def fail(collection, data):
+        raise RuntimeError("Firestore unavailable")
+
+    monkeypatch.setattr(api.main, "upload_data", fail)
+    move = {"trailer_id": "T1", "to_wh_yard": "FRZ", "to_door": "5"}
+    assert api.post("/add-record", json={"collection": "moves", "data": [move]}).status_code == 500
+    assert api.main.occupancy_index.at_door("FRZ", "5")["reserved_by"] is None
+
+
+def test_free_doors_come_from_the_location_record(api):
+    response = api.get("/free-doors", params={"location": "FRZ"})
+    assert response.status_code == 404
+    assert "No doors are configured for FRZ" in response.json()["detail"]
+
+    location = {"id": "L1", "name": "FRZ", "doors": "1, 2, 3"}
+    assert api.post("/add-record", json={"collection": "locations", "data": [location]}).status_code == 200
+    assert api.db.collections["locations"]["L1"]["doors"] == ["1", "2", "3"]
+
+    move = {"trailer_id": "T1", "to_wh_yard": "FRZ", "to_door": "2"}
+    api.post("/add-record", json={"collection": "moves", "data": [move]})
+    assert api.get("/free-doors", params={"location": "frz"}).json()["free_doors"] == ["1", "3"]
+
+    api.request("PUT", "/update", params={"collection": "locations", "id": "L1"}, json={"doors": ["1", "2"]})
+    assert api.get("/free-doors", params={"location": "FRZ"}).json()["free_doors"] == ["1"]
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException  # noqa: E402
+
+from ratelimit import ConcurrencyLimiter, RateLimiter, TokenBucket  # noqa: E402
+
+
+@pytest.fixture
+def monotonic(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_allows_burst_then_refills(monotonic):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == pytest.approx(0.5)
+
+    monotonic[0] += 0.5
+    assert bucket.take() == 0
+    # Idle time never fills past the burst size
+    monotonic[0] += 60
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() > 0
+
+
+def test_rate_limiter_is_per_user_and_route(monotonic):
+    limiter = RateLimiter({"default": {"rate": 1, "burst": 1}, "/sync": {"rate": 1, "burst": 2}})
+    limiter.check("a", "/fetch-data")
+    with pytest.raises(HTTPException) as error:
+        limiter.check("a", "/fetch-data")
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "1"
+
+    limiter.check("b", "/fetch-data")
+    limiter.check("a", "/sync")
+    limiter.check("a", "/sync")
+
+
+def test_concurrency_limiter_refuses_instead_of_queueing():
+    limiter = ConcurrencyLimiter({"statistics": 1})
+    with limiter.admit("statistics"):
+        with pytest.raises(HTTPException) as error:
+            with limiter.admit("statistics"):
+                pass
+        assert error.value.status_code == 503
+    with limiter.admit("statistics"):
+        pass
+
+
+def test_limited_endpoints_run_in_the_threadpool():
+    # Blocking Firestore calls in an async endpoint would hold the event loop, so
+    # capped endpoints must be plain functions that FastAPI runs in its threadpool
+    pytest.importorskip("firebase_admin")
+    import asyncio
+
+    import main
+
+    limited = [route.endpoint for route in main.app.routes if hasattr(getattr(route, "endpoint", None), "__wrapped__")]
+    assert limited
+    for endpoint in limited:
+        assert not asyncio.iscoroutinefunction(endpoint), endpoint.__name__
@@ -0,0 +1,70 @@
+import pytest
+
+
+@pytest.fixture
+def claims(api, monkeypatch):
+    calls = []
+    monkeypatch.setattr(api.main, "set_role_claim", lambda uid, role: calls.append((uid, role)))
+    return calls
+
+
+def test_role_comes_from_the_claim_then_the_profile(api):
+    import roles
+
+    api.db.collections["user_master"] = {"u1": {"role": "Admin"}, "u2": {"role": "admin", "deleted": True}}
+    assert roles.get_role({"uid": "u1", "role": "driver"}) == "driver"
+    assert roles.get_role({"uid": "u1"}) == "admin"
+    assert roles.get_role({"uid": "u2"}) is None
+    assert roles.get_role({"uid": "missing"}) is None
+
+    # Profiles are cached
+    api.db.collections["user_master"]["u1"]["role"] = "driver"
+    assert roles.get_role({"uid": "u1"}) == "admin"
+
+
+def test_require_write_access(api):
+    from fastapi import HTTPException
+
+    import roles
+
+    roles.require_write_access({"uid": "u1", "role": "driver"}, "moves")
+    roles.require_write_access({"uid": "u1", "role": "admin"}, "user_master")
+    with pytest.raises(HTTPException) as error:
+        roles.require_write_access({"uid": "u1", "role": "driver"}, "user_master")
+    assert error.value.status_code == 403
+
+
+def test_only_admins_write_user_master(api, claims):
+    api.db.collections["user_master"] = {"u1": {"id": "u1", "role": "driver"}}
+
+    for method, path, kwargs in [
+        ("POST", "/add-record", {"json": {"collection": "user_master", "data": [{"id": "u1", "role": "admin"}]}}),
+        ("PUT", "/update", {"params": {"collection": "user_master", "id": "u1"}, "json": {"role": "admin"}}),
+        ("PUT", "/update-record", {"json": {"collection": "user_master", "data": [{"id": "u1", "role": "admin"}]}}),
+    ]:
+        response = api.request(method, path, token="u1:driver", **kwargs)
+        assert response.status_code == 403, path
+    assert api.db.collections["user_master"]["u1"]["role"] == "driver"
+    assert claims == []
+
+    response = api.request("PUT", "/update", token="boss:admin",
+                           params={"collection": "user_master", "id": "u1"}, json={"role": "dispatcher"})
+    assert response.status_code == 200
+    assert api.db.collections["user_master"]["u1"]["role"] == "dispatcher"
+    assert claims == [("u1", "dispatcher")]
+
+
+def test_me_backfills_the_role_claim(api, claims):
+    api.db.collections["user_master"] = {"u1": {"name": "Pat", "role": "driver"}}
+    body = api.get("/me", token="u1").json()
+    assert (body["role"], body["name"], body["claims_updated"]) == ("driver", "Pat", True)
+    assert claims == [("u1", "driver")]
+
+    body = api.get("/me", token="u1:driver").json()
+    assert body["claims_updated"] is False
+    assert len(claims) == 1
+
+
+def test_admin_only_endpoints(api):
+    assert api.get("/jobs", token="u1:driver").status_code == 403
+    assert api.post("/jobs", token="u1", json={"type": "rebuild_indexes"}).status_code == 403
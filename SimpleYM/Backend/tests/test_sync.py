@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("firebase_admin")
+
+import sync  # noqa: E402
+
+
+def test_token_round_trip():
+    now = datetime(2026, 1, 2, 3, 4, 5, 678901)
+    token = sync.encode_token(now)
+    assert "=" not in token
+    assert sync.decode_token(token) == now
+
+
+@pytest.mark.parametrize("token", ["", "not-a-token", "eyJ4IjogMX0"])
+def test_invalid_tokens_are_rejected(token):
+    with pytest.raises(ValueError):
+        sync.decode_token(token)
+
+
+def test_change_stamps():
+    stamps = sync.change_stamps(created=True)
+    assert stamps["created_at"] == stamps["updated_at"]
+    datetime.fromisoformat(stamps["updated_at"])
+    assert set(sync.change_stamps()) == {"updated_at"}
+
+
+def test_offline_moves_are_stored_open_and_survive_a_restart(api):
+    from move_queue import MoveQueue
+
+    write = {"idempotency_key": "k1", "collection": "moves",
+             "data": {"trailer_id": "T1", "from_wh_yard": "FRZ", "from_door": "3"}}
+    response = api.post("/sync", json={"collections": ["moves"], "writes": [write]})
+    assert response.status_code == 200
+    assert response.json()["writes"][0]["status"] == "created"
+
+    (stored,) = api.db.collections["moves"].values()
+    assert stored["status"] == "open"
+    assert stored["created_at"] == stored["updated_at"]
+
+    restarted = MoveQueue()
+    restarted.load(api.db)
+    assert restarted.claim("driver1")["move"]["trailer_id"] == "T1"
+
+    # A replay is reported as a duplicate and not stored twice
+    replay = api.post("/sync", json={"collections": ["moves"], "writes": [write]})
+    assert replay.json()["writes"][0]["status"] == "duplicate"
+    assert len(api.db.collections["moves"]) == 1
+
+
+def test_add_record_moves_default_to_open(api):
+    response = api.post("/add-record", json={"collection": "moves", "data": [{"trailer_id": "T1"}]})
+    assert response.status_code == 200
+    (stored,) = api.db.collections["moves"].values()
+    assert stored["status"] == "open"
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+
+def reading(trailer_id="100001", timestamp=1767261600, **fields):
+    return {"trailer_id": trailer_id, "clr_temp": 34.5, "fzr_temp": -5, "timestamp": timestamp, **fields}
+
+
+@pytest.fixture
+def main():
+    pytest.importorskip("firebase_admin")
+    import main
+    return main
+
+
+def test_parse_accepts_arrays_objects_and_ndjson(main):
+    readings = [reading(), reading("100002")]
+    assert main.parse_temp_readings(json.dumps(readings).encode(), "application/json") == readings
+    assert main.parse_temp_readings(json.dumps({"readings": readings}).encode(), "application/json") == readings
+    ndjson = "\n".join(json.dumps(item) for item in readings) + "\n"
+    assert main.parse_temp_readings(ndjson.encode(), "application/x-ndjson") == readings
+
+
+@pytest.mark.parametrize("body", [json.dumps(reading()), '{"readings": {}}', '"text"', "[1, NaN]"])
+def test_parse_rejects_payloads_that_are_not_lists_of_readings(main, body):
+    with pytest.raises(ValueError):
+        main.parse_temp_readings(body.encode(), "application/json")
+
+
+def test_timestamps(main):
+    seconds = main.normalize_reading_timestamp(1767261600)
+    assert main.normalize_reading_timestamp(1767261600000) == seconds
+    assert main.normalize_reading_timestamp("2026-01-01T10:00:00Z") == seconds
+    for bad in (True, False, 1e300, "yesterday"):
+        with pytest.raises(ValueError):
+            main.normalize_reading_timestamp(bad)
+
+
+def test_bulk_ingest_rejects_bad_readings_individually(api):
+    readings = [
+        reading(),
+        reading(),  # duplicate of the first
+        reading("100002", timestamp=True),
+        reading("100003", clr_temp="warm"),
+        reading(None),
+        reading("100004", timestamp="2026-01-01T11:00:00Z"),
+    ]
+    response = api.post("/add-temp-checks", json=readings)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["written"], body["duplicates"], body["rejected"]) == (2, 1, 3)
+    assert [error["index"] for error in body["errors"]] == [2, 3, 4]
+    assert set(api.db.collections["temperature_checks"]) == {"TC_100001_1767261600000", "TC_100004_1767265200000"}
+
+
+def test_bulk_ingest_rejects_a_lone_reading(api):
+    response = api.post("/add-temp-checks", json=reading())
+    assert response.status_code == 400
+    assert not api.db.collections.get("temperature_checks")
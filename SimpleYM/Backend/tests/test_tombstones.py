@@ -0,0 +1,93 @@
+import pytest
+
+
+class Context:
+    """Stands in for the JobContext a job runs with."""
+
+    def progress(self, done, total=None, message=None, checkpoint=None):
+        pass
+
+    def check_cancelled(self):
+        pass
+
+
+@pytest.fixture
+def firebase_auth(api, monkeypatch):
+    calls = []
+    monkeypatch.setattr(api.main.auth, "update_user", lambda uid, **fields: calls.append(("update", uid, fields)))
+    monkeypatch.setattr(api.main.auth, "delete_user", lambda uid: calls.append(("delete", uid)))
+    return calls
+
+
+def seed_trailer(api):
+    api.db.collections.update({
+        "trailer_master": {"T1": {"id": "T1", "reefer": False}},
+        "moves": {
+            "m1": {"trailer_id": "T1", "status": "completed", "to_location": "FRZ", "to_door": "5",
+                   "completed_at": "2026-01-01T10:00:00"},
+            "m2": {"trailer_id": "T1", "status": "open", "from_wh_yard": "FRZ", "from_door": "5"},
+        },
+        "temperature_checks": {"c1": {"trailer_id": "T1", "clr_temp": 34}},
+    })
+    for move_id, move in api.db.collections["moves"].items():
+        api.main.occupancy_index.apply_move({"id": move_id, **move})
+        api.main.move_queue.apply_move({"id": move_id, **move})
+
+
+def test_delete_leaves_a_tombstone_and_frees_the_door(api):
+    seed_trailer(api)
+    assert api.main.occupancy_index.trailer_location("T1") == {"location": "FRZ", "door": "5"}
+
+    response = api.request("DELETE", "/delete", token="boss:admin", params={"collection": "trailer_master", "id": "T1"})
+    assert response.status_code == 200
+    tombstone = api.db.collections["trailer_master"]["T1"]
+    assert tombstone["deleted"] is True and tombstone["deleted_by"] == "boss@example.com"
+    assert api.main.occupancy_index.trailer_location("T1") is None
+
+    # Tombstones read as missing
+    again = api.request("DELETE", "/delete", token="boss:admin", params={"collection": "trailer_master", "id": "T1"})
+    assert again.status_code == 404
+
+
+def test_compaction_cascades_then_purges(api):
+    seed_trailer(api)
+    api.request("DELETE", "/delete", token="boss:admin", params={"collection": "trailer_master", "id": "T1"})
+
+    result = api.main.compact_tombstones_job(Context())
+    assert result == {"purged": 0, "cascaded": 3}
+    moves = api.db.collections["moves"]
+    assert all(move["deleted"] is True for move in moves.values())
+    assert moves["m1"]["deleted_by"] == "cascade:trailer_master/T1"
+    assert api.db.collections["temperature_checks"]["c1"]["deleted"] is True
+    assert api.db.collections["trailer_master"]["T1"]["cascaded"] is True
+    # The open move leaves the queue
+    assert api.main.move_queue.claim("driver1") is None
+
+    # Already cascaded tombstones are not cascaded again
+    assert api.main.compact_tombstones_job(Context()) == {"purged": 0, "cascaded": 0}
+
+    result = api.main.compact_tombstones_job(Context(), retention_days=-1)
+    assert result["purged"] == 4
+    assert not any(api.db.collections[name] for name in ("trailer_master", "moves", "temperature_checks"))
+
+
+def test_deleted_users_leave_auth_at_the_next_compaction(api, firebase_auth):
+    api.db.collections["user_master"] = {"u1": {"email": "u1@example.com", "role": "driver"}}
+
+    response = api.request("DELETE", "/delete", token="boss:admin", params={"collection": "user_master", "id": "u1"})
+    assert response.status_code == 200
+    assert firebase_auth == [("update", "u1", {"disabled": True})]
+
+    api.main.compact_tombstones_job(Context())
+    assert firebase_auth[-1] == ("delete", "u1")
+    # The tombstone is kept for the retention period, Auth is not asked again
+    assert api.db.collections["user_master"]["u1"]["deleted"] is True
+    api.main.compact_tombstones_job(Context())
+    assert firebase_auth.count(("delete", "u1")) == 1
+
+
+def test_only_admins_delete(api):
+    seed_trailer(api)
+    response = api.request("DELETE", "/delete", params={"collection": "trailer_master", "id": "T1"})
+    assert response.status_code == 403
+    assert "deleted" not in api.db.collections["trailer_master"]["T1"]
@@ -0,0 +1,114 @@
+import math
+from datetime import datetime
+
+import pytest
+
+from validation import (
+    ValidationError,
+    coerce_boolean,
+    coerce_number,
+    coerce_timestamp,
+    validate_dataframe,
+    validate_record,
+    validate_records,
+)
+
+
+def test_coercers():
+    assert coerce_number("12") == 12
+    assert coerce_number("1.5") == 1.5
+    assert coerce_number(3.0) == 3
+    for bad in (True, "abc", math.nan, math.inf, "-Infinity"):
+        with pytest.raises(ValueError):
+            coerce_number(bad)
+
+    assert coerce_boolean("Yes") is True
+    assert coerce_boolean(1.0) is True
+    assert coerce_boolean(0) is False
+    with pytest.raises(ValueError):
+        coerce_boolean("maybe")
+
+    assert coerce_timestamp("2026-01-01T10:00:00Z") == "2026-01-01T10:00:00Z"
+    assert coerce_timestamp(datetime(2026, 1, 1, 10)) == "2026-01-01T10:00:00"
+    with pytest.raises(ValueError):
+        coerce_timestamp("01/02/2026")
+
+
+def test_validate_record_coerces_to_schema():
+    record = validate_record("trailer_master", {
+        "id": 123456.0, "year": "2019", "reefer": "no", "zones": 2.0, "extra": "kept",
+    })
+    assert record == {"id": "123456", "year": 2019, "reefer": False, "zones": 2, "extra": "kept"}
+
+
+def test_validate_record_reports_every_bad_field():
+    with pytest.raises(ValidationError) as error:
+        validate_record("trailer_master", {"year": "old", "reefer": "maybe"})
+    assert {e["field"] for e in error.value.errors} == {"id", "year", "reefer"}
+    assert error.value.error_count == 3
+
+
+def test_partial_updates_only_check_present_required_fields():
+    assert validate_record("moves", {"status": "open"}, partial=True) == {"status": "open"}
+    with pytest.raises(ValidationError):
+        validate_record("moves", {"trailer_id": ""}, partial=True)
+
+
+def test_validate_records_indexes_errors():
+    with pytest.raises(ValidationError) as error:
+        validate_records("moves", [{"trailer_id": "T1"}, {"trailer_id": None}])
+    assert error.value.errors == [{"index": 1, "field": "trailer_id", "error": "is required"}]
+
+
+def test_validate_dataframe_matches_record_path():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({
+        "id": [123456.0, 234567.0],
+        "year": ["2019", None],
+        "reefer": [1.0, None],
+        "roll_up_door": ["yes", "no"],
+    })
+    records = validate_dataframe("trailer_master", df).to_dict(orient="records")
+    assert records[0] == validate_record("trailer_master", {"id": 123456.0, "year": "2019", "reefer": 1.0,
+                                                            "roll_up_door": "yes"})
+    assert records[1]["year"] is None
+    assert records[1]["reefer"] is None
+
+
+def test_validate_dataframe_stores_timestamps_as_iso_strings():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({
+        "trailer_id": ["T1", "T2"],
+        "completed_at": [pd.Timestamp("2026-01-01 10:00"), "2026-01-02T08:00:00"],
+    })
+    records = validate_dataframe("moves", df).to_dict(orient="records")
+    assert [record["completed_at"] for record in records] == ["2026-01-01T10:00:00", "2026-01-02T08:00:00"]
+
+
+def test_validate_dataframe_reports_spreadsheet_rows():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({"id": ["A1", None], "year": ["2019", "old"], "length": [53, math.inf]})
+    with pytest.raises(ValidationError) as error:
+        validate_dataframe("trailer_master", df)
+    assert {(e["row"], e["field"]) for e in error.value.errors} == {(3, "id"), (3, "year"), (3, "length")}
+
+
+def test_validate_dataframe_keeps_blanks_none_and_whole_numbers_int():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({"id": ["A1", "A2"], "year": [2019, None], "length": [53.0, 48.5]})
+    records = validate_dataframe("trailer_master", df).to_dict(orient="records")
+    assert records[0]["year"] == 2019 and type(records[0]["year"]) is int
+    assert records[1]["year"] is None
+    assert [record["length"] for record in records] == [53, 48.5]
+    assert type(records[0]["length"]) is int
+
+
+def test_single_temperature_checks_are_validated(api):
+    check = {"trailer_id": "100001", "clr_temp": "34.5", "fzr_temp": -5, "id": "TC1"}
+    assert api.post("/add-temp-check", json=check).status_code == 200
+    assert api.db.collections["temperature_checks"]["TC1"]["clr_temp"] == 34.5
+
+    response = api.post("/add-temp-check", json={**check, "id": "TC2", "clr_temp": "warm"})
+    assert response.status_code == 422
+    assert response.json()["detail"]["errors"] == [{"field": "clr_temp", "error": "must be a number"}]
+    assert "TC2" not in api.db.collections["temperature_checks"]
@@ -0,0 +1,251 @@
+"""
+Schema validation for collection writes.
+
+Validators are compiled once per collection from config.COLLECTION_SCHEMA (the
+same schema served by /collection-schema) and coerce values to the declared
+types, so string years or float trailer IDs from Excel are fixed before they
+reach Firestore. Collections without a schema are passed through unchanged.
+"""
+
+import math
+from datetime import datetime
+from config import COLLECTION_SCHEMA, REQUIRED_FIELDS
+
+TRUE_VALUES = {"true", "yes", "y", "1"}
+FALSE_VALUES = {"false", "no", "n", "0", ""}
+
+# Cap on errors reported back for one request
+MAX_REPORTED_ERRORS = 100
+
+
+class ValidationError(ValueError):
+    """Raised when records do not match their collection schema. Holds per-field errors."""
+
+    def __init__(self, errors):
+        self.errors = errors[:MAX_REPORTED_ERRORS]
+        self.error_count = len(errors)
+        super().__init__(f"{len(errors)} validation error(s): " + "; ".join(
+            f"{error['field']}: {error['error']}" for error in self.errors[:5]
+        ))
+
+
+def coerce_string(value):
+    if isinstance(value, float) and value.is_integer():
+        # Excel hands back numeric IDs as floats (123456.0)
+        return str(int(value))
+    return str(value).strip()
+
+
+def coerce_number(value):
+    if isinstance(value, bool):
+        raise ValueError("must be a number")
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        text = str(value).strip()
+        try:
+            number = int(text)
+        except ValueError:
+            try:
+                number = float(text)
+            except ValueError:
+                raise ValueError("must be a number")
+    if isinstance(number, float) and not math.isfinite(number):
+        raise ValueError("must be a finite number")
+    if isinstance(number, float) and number.is_integer():
+        return int(number)
+    return number
+
+
+def coerce_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError("must be a boolean")
+
+
+def coerce_timestamp(value):
+    # Stored as ISO strings: history, sync and archive queries compare them as strings
+    if isinstance(value, datetime):
+        return value.isoformat()
+    text = str(value).strip()
+    try:
+        datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("must be an ISO 8601 timestamp")
+    return text
+
+
+def coerce_array(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(",") if part.strip()]
+    raise ValueError("must be an array")
+
+
+COERCERS = {
+    "String": coerce_string,
+    "Number": coerce_number,
+    "Boolean": coerce_boolean,
+    "Timestamp": coerce_timestamp,
+    "Array": coerce_array,
+}
+
+
+def compile_validator(collection):
+    """
+    Builds a validator function for a collection. The returned function takes a
+    record and returns a coerced copy, raising ValidationError on bad fields.
+    With partial=True (updates), missing required fields are allowed but
+    required fields that are present must not be empty.
+    """
+    schema = COLLECTION_SCHEMA.get(collection)
+    if schema is None:
+        return lambda record, partial=False: dict(record)
+
+    fields = [(field, COERCERS[field_type]) for field, field_type in schema.items()]
+    required = REQUIRED_FIELDS.get(collection, [])
+
+    def validate(record, partial=False):
+        if not isinstance(record, dict):
+            raise ValidationError([{"field": "record", "error": "must be an object"}])
+
+        item = dict(record)
+        errors = []
+
+        for field in required:
+            if (field in item or not partial) and item.get(field) in (None, ""):
+                errors.append({"field": field, "error": "is required"})
+
+        for field, coerce in fields:
+            value = item.get(field)
+            if value is None:
+                continue
+            try:
+                item[field] = coerce(value)
+            except ValueError as e:
+                errors.append({"field": field, "error": str(e)})
+
+        if errors:
+            raise ValidationError(errors)
+        return item
+
+    return validate
+
+
+VALIDATORS = {collection: compile_validator(collection) for collection in COLLECTION_SCHEMA}
+
+
+def get_validator(collection):
+    if collection not in VALIDATORS:
+        VALIDATORS[collection] = compile_validator(collection)
+    return VALIDATORS[collection]
+
+
+def validate_record(collection, record, partial=False):
+    return get_validator(collection)(record, partial=partial)
+
+
+def validate_records(collection, records):
+    """Validates a list of records, collecting errors for all of them before raising."""
+    validate = get_validator(collection)
+    validated = []
+    errors = []
+
+    for index, record in enumerate(records):
+        try:
+            validated.append(validate(record))
+        except ValidationError as e:
+            errors.extend({"index": index, **error} for error in e.errors)
+
+    if errors:
+        raise ValidationError(errors)
+    return validated
+
+
+def validate_dataframe(collection, df):
+    """
+    Vectorized validation for spreadsheet uploads. Each schema column is coerced
+    in one pass, and rows that fail are reported with their spreadsheet row
+    number (header is row 1). Returns the coerced DataFrame with NaN replaced
+    by None.
+    """
+    import numpy as np
+    import pandas as pd
+
+    schema = COLLECTION_SCHEMA.get(collection, {})
+    errors = []
+    df = df.copy()
+
+    def collect(mask, field, message):
+        for index in df.index[mask]:
+            errors.append({"row": int(index) + 2, "field": field, "error": message})
+
+    def coerce_each(column, coerce):
+        # Same coercer as the record path; failures become NaN for the error mask
+        def apply(value):
+            try:
+                return coerce(value)
+            except ValueError:
+                return None
+        return column.map(apply, na_action="ignore")
+
+    for field in REQUIRED_FIELDS.get(collection, []):
+        if field not in df.columns:
+            errors.append({"row": None, "field": field, "error": "column is required"})
+            continue
+        blank = df[field].isna() | (df[field].astype(str).str.strip() == "")
+        collect(blank, field, "is required")
+
+    for field, field_type in schema.items():
+        if field not in df.columns:
+            continue
+        column = df[field]
+        present = column.notna()
+
+        if field_type == "Number":
+            numbers = pd.to_numeric(column, errors="coerce")
+            collect(present & numbers.isna(), field, "must be a number")
+            collect(numbers.isin([math.inf, -math.inf]), field, "must be a finite number")
+            df[field] = numbers
+
+        elif field_type == "String":
+            if pd.api.types.is_float_dtype(column) and (column.dropna() % 1 == 0).all():
+                column = column.astype("Int64")
+            df[field] = column.astype(str).str.strip().where(present, None)
+
+        elif field_type == "Boolean":
+            booleans = coerce_each(column, coerce_boolean)
+            collect(present & booleans.isna(), field, "must be a boolean")
+            df[field] = booleans.where(present, None)
+
+        elif field_type == "Timestamp":
+            timestamps = coerce_each(column, coerce_timestamp)
+            collect(present & timestamps.isna(), field, "must be an ISO 8601 timestamp")
+            df[field] = timestamps.where(present, None)
+
+    if errors:
+        raise ValidationError(errors)
+
+    # Columns are rebuilt as object Series: map() or where() would re-infer
+    # float64 and turn blanks back into NaN and whole numbers into floats
+    def cell(value, field_type):
+        if pd.api.types.is_scalar(value) and pd.isna(value):
+            return None
+        if isinstance(value, np.generic):
+            value = value.item()
+        if field_type == "Number" and isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+
+    for field in df.columns:
+        field_type = schema.get(field)
+        df[field] = pd.Series([cell(value, field_type) for value in df[field]], dtype=object, index=df.index)
+    return df
@@ -14,7 +14,7 @@ const SessionMonitor = () => {
       if (user) {
         try {
           const token = await user.getIdToken();
-          const userDoc = await getUserRole(user.email);
+          const userDoc = await getUserRole();
 
           setSessionInfo({
             uid: user.uid,
@@ -38,17 +38,17 @@ const SessionMonitor = () => {
     return Math.random().toString(36).substr(2, 9);
   };
 
-  const getUserRole = async (email) => {
+  const getUserRole = async () => {
     try {
       const user = auth.currentUser;
       if (!user) return null;
 
       const token = await user.getIdToken();
-      const response = await axios.get(`http://127.0.0.1:8000/fetch-data?collection=user_master`, {
+      const response = await axios.get(`http://127.0.0.1:8000/me`, {
         headers: { Authorization: `Bearer ${token}` }
       });
 
-      return response.data.data?.find(u => u.email === email);
+      return response.data;
     } catch (error) {
       console.error('Error fetching user role:', error);
       return null;
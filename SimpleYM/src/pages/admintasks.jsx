@@ -13,6 +13,7 @@ const AdminTasks = () => {
   const [showAddForm, setShowAddForm] = useState(false);
   const [addMethod, setAddMethod] = useState("individual");
   const [file, setFile] = useState(null);
+  const [uploadStatus, setUploadStatus] = useState(null);
   const [error, setError] = useState(null);
 
   // States for edit and delete functionality
@@ -309,16 +310,48 @@ const AdminTasks = () => {
         { headers: { Authorization: `Bearer ${token}` } }
       );
 
+      // The import runs as a background job; poll it until it finishes
       console.log("File upload response:", response.data);
-      alert("File uploaded successfully!");
-      fetchRecords();
-      setFile(null);
+      setUploadStatus("Upload received, importing...");
+      const job = await waitForJob(response.data.job_id);
+      setUploadStatus(null);
+
+      if (job.status === "succeeded") {
+        alert(job.result?.message || "File uploaded successfully!");
+        fetchRecords();
+        setFile(null);
+      } else if (job.status === "failed") {
+        const rowErrors = (job.result?.errors || [])
+          .slice(0, 10)
+          .map((e) => `${e.row ? `Row ${e.row}: ` : ""}${e.field} ${e.error}`);
+        alert([`Upload failed: ${job.error}`, ...rowErrors].join("\n"));
+      } else {
+        alert("Upload was cancelled.");
+      }
     } catch (err) {
       console.error("Error uploading file:", err);
+      setUploadStatus(null);
       alert(err.response?.data?.detail || "Failed to upload file.");
     }
   };
 
+  const waitForJob = async (jobId) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      const token = await auth.currentUser.getIdToken();
+      const { data: job } = await axios.get(
+        `${import.meta.env.VITE_API_BASE_URL}/jobs/${jobId}`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      if (["succeeded", "failed", "cancelled"].includes(job.status)) {
+        return job;
+      }
+      if (job.progress?.total) {
+        setUploadStatus(`Importing... ${job.progress.done} of ${job.progress.total} rows`);
+      }
+    }
+  };
+
   const renderTable = () => {
     if (!dataLoaded) {
       return (
@@ -624,9 +657,11 @@ const AdminTasks = () => {
                     className="w-full px-2 py-1 border"
                   />
                 </div>
+                {uploadStatus && <p className="text-sm text-gray-600 mb-2">{uploadStatus}</p>}
                 <div className="flex justify-end">
                   <button
                     onClick={handleUploadExcel}
+                    disabled={!!uploadStatus}
                     className="px-4 py-2 bg-green-600 text-white rounded-lg hover:bg-green-500 mr-2"
                   >
                     Upload
@@ -101,7 +101,7 @@ const Dashboard = () => {
       const openMovesQuery = query(movesCollection, where("status", "in", ["open", "Open", "OPEN"]));
       const openMovesSnapshot = await getDocs(openMovesQuery);
       setOpenMovesList(
-        openMovesSnapshot.docs.map((doc) => {
+        openMovesSnapshot.docs.filter((doc) => !doc.data().deleted).map((doc) => {
           const data = doc.data();
 
           // Fix timezone issue by ensuring consistent time handling
@@ -133,7 +133,7 @@ const Dashboard = () => {
       );
       const recentMovesSnapshot = await getDocs(recentMovesQuery);
       setRecentMoves(
-        recentMovesSnapshot.docs.map((doc) => {
+        recentMovesSnapshot.docs.filter((doc) => !doc.data().deleted).map((doc) => {
           const data = doc.data();
 
           // Fix timezone issue for completed moves
@@ -161,7 +161,7 @@ const Dashboard = () => {
       const tempCheckQuery = query(tempCheckCollection, orderBy("timestamp", "desc"));
       const tempCheckSnapshot = await getDocs(tempCheckQuery);
       setTempCheckList(
-        tempCheckSnapshot.docs.map((doc) => doc.data())
+        tempCheckSnapshot.docs.filter((doc) => !doc.data().deleted).map((doc) => doc.data())
       );
 
       // Generate Last Known Locations from moves data
@@ -196,7 +196,7 @@ const Dashboard = () => {
       const allMovesQuery = query(movesCollection, orderBy("timestamp", "desc"));
       const allMovesSnapshot = await getDocs(allMovesQuery);
 
-      const allMoves = allMovesSnapshot.docs.map((doc) => doc.data());
+      const allMoves = allMovesSnapshot.docs.filter((doc) => !doc.data().deleted).map((doc) => doc.data());
 
       // Group moves by trailer_id and find the most recent move for each trailer
       const trailerLastMoves = {};
@@ -2,8 +2,6 @@ import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import { auth } from "../firebase";
 import { signOut } from "firebase/auth";
-import { collection, query, where, getDocs } from "firebase/firestore";
-import { firestore } from "../firebase";
 import { API_BASE_URL } from "../config";
 
 const Landing = () => {
@@ -22,19 +20,27 @@ const Landing = () => {
       }
 
       try {
-        const userCollection = collection(firestore, "user_master");
-        const userQuery = query(userCollection, where("email", "==", user.email));
-        const userSnapshot = await getDocs(userQuery);
+        const token = await user.getIdToken();
+        const response = await fetch(`${API_BASE_URL}/me`, {
+          headers: { Authorization: `Bearer ${token}` },
+        });
+        if (!response.ok) {
+          throw new Error(`Failed to fetch user profile: ${response.statusText}`);
+        }
+        const profile = await response.json();
+
+        // Role was just added to the token claims; refresh so later requests carry it
+        if (profile.claims_updated) {
+          await user.getIdToken(true);
+        }
 
-        if (userSnapshot.empty) {
-          console.warn(`No user document found for email: ${user.email}`);
+        if (!profile.role) {
+          console.warn(`No role found for email: ${user.email}`);
           setError("No user document found. Please contact an admin.");
           setRole(null);
         } else {
-          const userData = userSnapshot.docs[0].data();
-          console.log("Fetched User Document:", userData);
-          const userRole = userData.role || "guest";
-          setRole(userRole.toLowerCase());
+          console.log("Fetched User Profile:", profile);
+          setRole(profile.role.toLowerCase());
           setError(null);
         }
       } catch (err) {
@@ -1,12 +1,13 @@
 import React, { useEffect, useState } from "react";
-import { firestore, auth } from "../firebase"; // IMPORT AUTH
+import { auth } from "../firebase";
 import { useNavigate } from "react-router-dom";
-import { collection, doc, query, onSnapshot, updateDoc } from "firebase/firestore";
 import { API_BASE_URL } from '../config';
 
 const Moves = () => {
-  const [openMoves, setOpenMoves] = useState([]);
+  // Moves are handed out one at a time by the backend move queue (/moves/claim)
+  const [lease, setLease] = useState(null);
   const [selectedMove, setSelectedMove] = useState(null);
+  const [queueStats, setQueueStats] = useState(null);
   const [toOptions, setToOptions] = useState({
     to_location: "",
     to_door: "",
@@ -15,36 +16,50 @@ const Moves = () => {
   const [error, setError] = useState(null);
   const [successMessage, setSuccessMessage] = useState(null);
   const [currentTime, setCurrentTime] = useState("");
+  const [now, setNow] = useState(Date.now());
   const navigate = useNavigate();
 
-  useEffect(() => {
-    const fetchOpenMoves = () => {
-      const q = query(collection(firestore, "moves"));
-
-      // Real-time listener
-      const unsubscribe = onSnapshot(
-        q,
-        (snapshot) => {
-          const moves = snapshot.docs
-            .map((doc) => ({
-              id: doc.id,
-              ...doc.data(),
-            }))
-            .filter(
-              (move) =>
-                !move.status || move.status === "open" || move.status === "picked up"
-            )
-            .sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
+  const apiRequest = async (path, options = {}) => {
+    const user = auth.currentUser;
+    if (!user) {
+      navigate("/");
+      throw new Error("User not authenticated. Please log in.");
+    }
+    const token = await user.getIdToken();
+    const response = await fetch(`${API_BASE_URL}${path}`, {
+      ...options,
+      headers: {
+        "Content-Type": "application/json",
+        Authorization: `Bearer ${token}`,
+      },
+    });
+    const data = await response.json().catch(() => ({}));
+    if (!response.ok) {
+      throw new Error(data.detail || response.statusText);
+    }
+    return data;
+  };
 
-          setOpenMoves(moves);
-        },
-        (err) => {
-          console.error("Error fetching moves:", err);
-          setError("Failed to load moves. Please try again.");
+  useEffect(() => {
+    const fetchCurrentMove = async () => {
+      try {
+        const data = await apiRequest("/moves/current");
+        if (data.move) {
+          setSelectedMove(data.move);
+        } else if (data.lease) {
+          setLease(data.lease);
         }
-      );
+      } catch (err) {
+        console.error("Error fetching current move:", err);
+      }
+    };
 
-      return unsubscribe;
+    const fetchQueueStats = async () => {
+      try {
+        setQueueStats(await apiRequest("/moves/queue-stats"));
+      } catch (err) {
+        console.error("Error fetching queue stats:", err);
+      }
     };
 
     const fetchLocations = async () => {
@@ -74,20 +89,35 @@ const Moves = () => {
       }
     };
 
-    const unsubscribe = fetchOpenMoves();
+    fetchCurrentMove();
+    fetchQueueStats();
     fetchLocations();
     fetchCurrentTime();
 
-    // Optional: Poll the server for the current time every 60 seconds
-    const interval = setInterval(fetchCurrentTime, 60000);
+    // Poll the server for the current time and queue depth every 60 seconds
+    const interval = setInterval(() => {
+      fetchCurrentTime();
+      fetchQueueStats();
+    }, 60000);
+    const ticker = setInterval(() => setNow(Date.now()), 1000);
 
     return () => {
-      unsubscribe();
       clearInterval(interval);
+      clearInterval(ticker);
     };
   }, []);
 
-  const calculateMinutesSinceSubmission = (timestamp) => {
+  // An unacknowledged lease goes back to the queue when it expires
+  const leaseSecondsLeft = lease ? Math.max(0, Math.floor(lease.lease_expires_at - now / 1000)) : 0;
+  useEffect(() => {
+    if (lease && leaseSecondsLeft === 0) {
+      setLease(null);
+      setError("Your hold on the move expired. Get the next move to continue.");
+    }
+  }, [lease, leaseSecondsLeft]);
+
+  const calculateMinutesSinceSubmission = (move) => {
+    const timestamp = move.created_at || move.timestamp;
     if (!timestamp) return "N/A";
     const submissionTime = new Date(timestamp);
     const currentTime = new Date();
@@ -95,49 +125,51 @@ const Moves = () => {
     return Math.floor(diffInMs / (1000 * 60));
   };
 
-  const handleSelectMove = async (move) => {
-    if (selectedMove) {
-      setError("You can only pick up one move at a time.");
-      return;
-    }
-
-    setSelectedMove(move);
+  const handleClaimMove = async () => {
     setError(null);
     setSuccessMessage(null);
-
     try {
-      // GET CURRENT USER INFORMATION
-      const user = auth.currentUser;
-      if (!user) {
-        setError("User not authenticated. Please log in.");
-        navigate("/");
+      const data = await apiRequest("/moves/claim", { method: "POST" });
+      if (!data.move) {
+        setSuccessMessage("No open moves right now.");
         return;
       }
+      setLease(data);
+    } catch (err) {
+      console.error("Error claiming move:", err);
+      setError(`Failed to get the next move: ${err.message}`);
+    }
+  };
 
-      const moveDocRef = doc(firestore, "moves", move.id);
-      await updateDoc(moveDocRef, {
-        status: "picked up",
-        picked_up_at: new Date().toISOString(),
-        user_id: user.uid, // ADD USER ID
-        email: user.email, // ADD USER EMAIL
-      });
-      console.log(`Move ${move.id} successfully updated with picked_up_at timestamp and user info.`);
+  const handlePickUp = async () => {
+    try {
+      const data = await apiRequest(`/moves/${lease.move.id}/ack`, { method: "POST" });
+      setSelectedMove(data.move);
+      setLease(null);
+      setError(null);
+      console.log(`Move ${data.move.id} picked up.`);
     } catch (err) {
       console.error("Error marking move as picked up:", err);
+      setLease(null);
       setError(`Failed to mark move as picked up: ${err.message}`);
     }
   };
 
+  const handleSkip = async () => {
+    try {
+      await apiRequest(`/moves/${lease.move.id}/release`, { method: "POST" });
+    } catch (err) {
+      console.error("Error releasing move:", err);
+    }
+    setLease(null);
+    // Skipped moves aren't offered to this driver again for a while, so this gets the next one
+    await handleClaimMove();
+  };
+
   const handleCancelMoveCompletion = async () => {
     if (selectedMove) {
       try {
-        const moveDocRef = doc(firestore, "moves", selectedMove.id);
-        await updateDoc(moveDocRef, {
-          status: "open",
-          // Remove user info when cancelling
-          user_id: null,
-          email: null
-        });
+        await apiRequest(`/moves/${selectedMove.id}/reopen`, { method: "POST" });
         setSelectedMove(null);
         setToOptions({ to_location: "", to_door: "" });
         setError(null);
@@ -161,28 +193,17 @@ const Moves = () => {
     }
 
     try {
-      // GET CURRENT USER INFORMATION
-      const user = auth.currentUser;
-      if (!user) {
-        setError("User not authenticated. Please log in.");
-        navigate("/");
-        return;
-      }
-
-      const moveDocRef = doc(firestore, "moves", selectedMove.id);
-      await updateDoc(moveDocRef, {
-        to_location: toOptions.to_location,
-        to_door: toOptions.to_door,
-        status: "completed",
-        completed_at: new Date().toISOString(),
-        user_id: user.uid, // ADD/UPDATE USER ID
-        email: user.email, // ADD/UPDATE USER EMAIL
+      await apiRequest(`/moves/${selectedMove.id}/complete`, {
+        method: "POST",
+        body: JSON.stringify(toOptions),
       });
       setSuccessMessage("Move updated successfully!");
-      console.log(`Move ${selectedMove.id} successfully updated with completed_at timestamp and user info.`);
+      setError(null);
+      console.log(`Move ${selectedMove.id} completed.`);
       setSelectedMove(null);
       setToOptions({ to_location: "", to_door: "" });
     } catch (err) {
+      // 409 when the door is occupied or another move is headed there
       console.error("Error updating move:", err);
       setError(`Failed to update move: ${err.message}`);
     }
@@ -194,55 +215,65 @@ const Moves = () => {
       {successMessage && <p className="text-green-500">{successMessage}</p>}
 
       <h2 className="text-3xl font-bold mb-6 text-indigo-700">Open Moves</h2>
-      <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-        {openMoves.map((move) => (
-          <div
-            key={move.id}
-            className={`p-4 bg-white shadow-lg rounded-lg border cursor-pointer hover:shadow-xl transform hover:scale-105 transition-all duration-200 ${
-              selectedMove && selectedMove.id === move.id
-                ? "border-yellow-500 bg-yellow-100"
-                : move.status === "picked up"
-                ? "border-green-500 bg-green-100"
-                : "border-red-500 bg-red-100"
-            }`}
-            onClick={() => handleSelectMove(move)}
-          >
-            <h3 className="text-xl font-semibold text-indigo-700 mb-2">
-              Trailer ID: {move.trailer_id || "Unknown"}
-            </h3>
-            <p
-              className={`text-lg font-bold ${
-                move.status === "picked up" ? "text-green-700" : "text-red-700"
-              } mb-2`}
+      {queueStats && (
+        <p className="text-lg text-gray-600 mb-4">
+          Moves waiting: <span className="font-bold">{queueStats.queued}</span>
+        </p>
+      )}
+
+      {!lease && !selectedMove && (
+        <button
+          onClick={handleClaimMove}
+          className="px-4 py-2 bg-indigo-600 text-white rounded-lg hover:bg-indigo-500"
+        >
+          Get Next Move
+        </button>
+      )}
+
+      {lease && (
+        <div className="p-4 bg-white shadow-lg rounded-lg border border-red-500 bg-red-100 max-w-md">
+          <h3 className="text-xl font-semibold text-indigo-700 mb-2">
+            Trailer ID: {lease.move.trailer_id || "Unknown"}
+          </h3>
+          <p className="text-lg font-bold text-red-700 mb-2">
+            Held for you: {leaseSecondsLeft}s
+          </p>
+          <p className="text-lg font-bold text-gray-600 mb-2">
+            Minutes Since Submission: {calculateMinutesSinceSubmission(lease.move)}
+          </p>
+          <p className="text-gray-600">
+            <span className="font-bold">From Location:</span> {lease.move.from_wh_yard}
+          </p>
+          <p className="text-gray-600">
+            <span className="font-bold">From Door:</span> {lease.move.from_door}
+          </p>
+          <p className="text-gray-600">
+            <span className="font-bold">Ready at:</span> {lease.move.timestamp}
+          </p>
+          <div className="flex space-x-4 mt-4">
+            <button
+              onClick={handlePickUp}
+              className="px-4 py-2 bg-green-600 text-white rounded-lg hover:bg-green-500"
+            >
+              Pick Up
+            </button>
+            <button
+              onClick={handleSkip}
+              className="px-4 py-2 bg-gray-600 text-white rounded-lg hover:bg-gray-500"
             >
-              {move.status === "picked up" ? "Picked Up" : "Open"}
-            </p>
-            <p className="text-lg font-bold text-gray-600 mb-2">
-              Minutes Since Submission: {calculateMinutesSinceSubmission(move.timestamp)}
-            </p>
-            <p className="text-gray-600">
-              <span className="font-bold">From Location:</span> {move.from_wh_yard}
-            </p>
-            <p className="text-gray-600">
-              <span className="font-bold">From Door:</span> {move.from_door}
-            </p>
-            <p className="text-gray-600">
-              <span className="font-bold">Ready at:</span> {move.timestamp}
-            </p>
-            {/* DISPLAY USER INFO IF AVAILABLE */}
-            {move.email && (
-              <p className="text-gray-600">
-                <span className="font-bold">Assigned to:</span> {move.email}
-              </p>
-            )}
+              Skip
+            </button>
           </div>
-        ))}
-      </div>
+        </div>
+      )}
 
       {selectedMove && (
         <div className="mt-6 bg-white p-4 shadow-md rounded-lg">
           <h2 className="text-lg font-semibold mb-4">Complete Move</h2>
           <p>Trailer ID: {selectedMove.trailer_id}</p>
+          <p className="text-gray-600">
+            From: {selectedMove.from_wh_yard} door {selectedMove.from_door}
+          </p>
           <div className="space-y-4">
             <div>
               <label className="block text-sm font-medium">To Location:</label>
@@ -307,4 +338,4 @@ const Moves = () => {
   );
 };
 
-export default Moves;
\ No newline at end of file
+export default Moves;
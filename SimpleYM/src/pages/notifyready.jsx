@@ -23,7 +23,7 @@ const NotifyReady = () => {
     const fetchTrailers = async () => {
       try {
         const snapshot = await getDocs(collection(firestore, "trailer_master"));
-        const trailerOptions = snapshot.docs.map((doc) => ({
+        const trailerOptions = snapshot.docs.filter((doc) => !doc.data().deleted).map((doc) => ({
           value: doc.data().id,
           label: doc.data().id,
         }));
@@ -113,9 +113,14 @@ const NotifyReady = () => {
       const timeData = await timeResponse.json();
       const timestamp = timeData.current_time;
 
+      // status and created_at put the move in the backend's move queue
+      const now = new Date().toISOString();
       await addDoc(collection(firestore, "moves"), {
         ...formData,
+        status: "open",
         timestamp: timestamp,
+        created_at: now,
+        updated_at: now,
         user_id: "currentUserId", // TODO: Replace with actual user ID
       });
 
@@ -64,7 +64,9 @@ const TempCheck = () => {
       setFzrTemp("");
     } catch (err) {
       console.error("Error submitting temp check:", err);
-      setError("Failed to record temperature check. Please try again.");
+      // 422 responses list the fields that failed validation
+      const detail = err.response?.data?.detail;
+      setError(detail?.message || "Failed to record temperature check. Please try again.");
       setSuccess(null);
     }
   };